@@ -3,17 +3,16 @@ Controller for Tab 4: Event Specific Distro.
 Handles business logic for event-specific distribution analysis.
 """
 
-import re
 import pandas as pd
 from models.data_loader import get_data
 from models.event_returns import calc_event_spec_returns
 from models.event_processor import month_end_filtering
-from models.constants import PERCENTAGE_EVENTS
+from models.event_store import load_event_store
+from models.event_index import event_name_mask
 from views.plotting import plot_data
 from views.formatters import convert_decimal_to_ticks, convert_ticks_to_decimal
 from views.table_builders import get_pivot_tables
 from views.exporters import download_combined_excel
-from utils.helpers import clean_text
 
 
 def load_event_data(x, y):
@@ -27,40 +26,18 @@ def load_event_data(x, y):
     Returns:
         dict with 'all_event_ts', 'ohcl_data', 'price_data_1m', 'latest_close_price'
     """
-    # Load event timestamps
-    all_event_ts = get_data("Intraday_data_files_processed_folder_pq", ['EconomicEventsSheet', 'target'], ".csv")
-    
-    # Clean event text
-    all_event_ts['events'] = all_event_ts['events'].astype(str).apply(clean_text)
-    
-    # Group to get latest values for each event-datetime combo
-    all_event_ts = (
-        all_event_ts
-        .sort_values(["datetime", "events"])
-        .groupby(["datetime", "events"], as_index=False)
-        .last()
-    )
-    
-    # Handle percentage events scaling
-    normalized = [re.escape(e.strip().lower().replace(" ", "")) for e in PERCENTAGE_EVENTS]
-    pattern = r'^(?:' + '|'.join(normalized) + ')'
-    event_clean = all_event_ts['events'].astype(str).str.strip().str.lower().str.replace(" ", "", regex=False)
-    mask = event_clean.str.match(pattern, na=False)
-    cols_to_scale = ['actual', 'consensus', 'forecast']
-    all_event_ts.loc[mask, cols_to_scale] = all_event_ts.loc[mask, cols_to_scale].mul(100)
+    # Load event timestamps (clean names, US/Eastern datetimes, percentage events scaled)
+    all_event_ts = load_event_store()
     
     # Load OHLC data
     ohcl_data = get_data("Intraday_data_files_pq", [x, y], ".parquet")
     
     # Convert timezone
     ohcl_data['US/Eastern Timezone'] = pd.to_datetime(ohcl_data.index, errors='coerce', utc=True)
-    all_event_ts['datetime'] = pd.to_datetime(all_event_ts['datetime'], errors='coerce', utc=True)
-    
     ohcl_data['US/Eastern Timezone'] = ohcl_data['US/Eastern Timezone'].dt.tz_convert('US/Eastern')
-    all_event_ts['datetime'] = all_event_ts['datetime'].dt.tz_convert('US/Eastern')
     
     # Load 1m price data for latest price
-    price_data_1m = get_data("Intraday_data_files_pq", [y, '1m'], ".parquet")
+    price_data_1m = get_data("Intraday_data_files_pq", [y, '1m'], ".parquet", columns=['Close', 'US/Eastern Timezone'])
     latest_close_price = price_data_1m['Close'].iloc[-1]
     
     return {
@@ -175,7 +152,7 @@ def process_event_distro(
     deviation_distro_dict = {}
     if selected_event != 'Month End' and sub_event_deviation is not None:
         for event in sub_event_dict[selected_event]:
-            mask = sub_event_deviation['cleaned_events'].str.startswith(event.strip().lower().replace(" ", ""))
+            mask = event_name_mask(sub_event_deviation['cleaned_events'], [event])
             temp_df = sub_event_deviation[mask].copy()
             temp_df.dropna(subset=['deviation'], inplace=True)
             if not temp_df.empty:
@@ -31,11 +31,11 @@ def process_session_analysis(x, y, selected_sessions, last_x_obs=None, custom_pi
             - 'download_data': BytesIO Excel file for download
     """
     # Load data
-    intraday_data = get_data('Intraday_data_files_processed_folder_pq', [x, y, 'nonevents'], '.parquet')
-    intraday_data = intraday_data[['timestamp', 'session', 'Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume', 'US/Eastern Timezone']]
+    intraday_data = get_data('Intraday_data_files_processed_folder_pq', [x, y, 'nonevents'], '.parquet',
+                             columns=['timestamp', 'session', 'Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume', 'US/Eastern Timezone'])
 
     # Get latest price for pivot
-    price_data_1m = get_data('Intraday_data_files_pq', ['1m', y], '.parquet')
+    price_data_1m = get_data('Intraday_data_files_pq', ['1m', y], '.parquet', columns=['Close', 'US/Eastern Timezone'])
     latest_close_price = price_data_1m['Close'].iloc[-1]
     latest_price_timestamp = price_data_1m['US/Eastern Timezone'].iloc[-1]
 
@@ -3,9 +3,10 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
 from returns import Returns
 from returns_main import ticker_match_tuple
+from models.catalog import resolve_dataset
+from models.data_loader import read_dataset
 
 def _calculate_return_bps(group):
         return (group["Close"].iloc[-1]-group["Open"].iloc[0]) * 16
@@ -39,11 +40,10 @@ def movement(movement_type, df):
 
      
 def get_dataframe(interval,ticker_name,folder):
-    for file in os.scandir(folder):
-       if file.is_file():
-          if all(x in str(file.name) for x in [interval, ticker_name]) and file.name.endswith('parquet'):
-              df=pd.read_parquet(os.path.join(folder,file.name))
-              break
+    entry = resolve_dataset(folder, [interval, ticker_name], '.parquet')
+    if entry is None:
+        raise FileNotFoundError(f'No parquet found for {ticker_name} {interval} in {folder}')
+    df=read_dataset(entry)
     return df
 
 def filter_dataframe(pre_df,filter_list="",day_dict="",timezone_column="",target_timezone="",interval="",ticker=""):
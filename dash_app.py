@@ -17,6 +17,10 @@ from models.data_loader import (
     get_data
 )
 
+from models.event_store import (
+    load_event_store
+)
+
 from models.constants import (
     EVENTS,
     SUB_EVENT_DICT,
@@ -855,13 +859,12 @@ def render_tab_1(n_clicks, store_data, pivot_val, last_x_obs_val, selected_sessi
         freq = store_data['frequency']
         inst = store_data['instrument']
 
-        intraday_data = get_data('Intraday_data_files_processed_folder_pq', [freq, inst, 'nonevents'], '.parquet')
-
-        intraday_data = intraday_data[['timestamp', 'session', 'Adj Close', 'Close',
-                                    'High', 'Low', 'Open', 'Volume',
-                                    'US/Eastern Timezone']]
+        intraday_data = get_data('Intraday_data_files_processed_folder_pq', [freq, inst, 'nonevents'], '.parquet',
+                                 columns=['timestamp', 'session', 'Adj Close', 'Close',
+                                          'High', 'Low', 'Open', 'Volume',
+                                          'US/Eastern Timezone'])
 
-        price_data_1m = get_data('Intraday_data_files_pq', ['1m', 'ZN'], '.parquet')
+        price_data_1m = get_data('Intraday_data_files_pq', ['1m', 'ZN'], '.parquet', columns=['Close', 'US/Eastern Timezone'])
         latest_close_price = price_data_1m['Close'].iloc[-1]
 
         # Pivot handling
@@ -1923,13 +1926,7 @@ def run_pullback_analysis(n_clicks, event_selected, trend_establish, trend_rever
         ohcl['timestamp'] = ohcl['timestamp'].dt.tz_localize('US/Eastern')
 
         # Load event data
-        event_data = get_data("Intraday_data_files_processed_folder_pq", ['EconomicEventsSheet', 'target'], ".csv")
-        event_data["events"] = event_data["events"].astype(str)
-        event_data = event_data.dropna(subset=["events"])
-        event_data = event_data.drop_duplicates(subset=["datetime", "events"], keep="last")
-        event_data["cleaned_events"] = event_data["events"].str.strip().str.lower().str.replace(" ", "")
-        event_data['datetime'] = pd.to_datetime(event_data['datetime'], utc=True, errors='coerce')
-        event_data['datetime'] = event_data['datetime'].dt.tz_convert('US/Eastern')
+        event_data = load_event_store()
 
         # Run analysis
         df_list = detect_moves(event_data, trend_establish, trend_reverse, event_selected, ohcl)
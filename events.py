@@ -1,18 +1,49 @@
 import pandas as pd
+import numpy as np
 from preprocessing import ManipulateTimezone
 import os
+import re
+import json
+import shutil
+from itertools import groupby
 
 #for converting the strings like $1.2B to numeric values. 
 # Used for conditional filtering (hotter/colder than exprected) in tab 5
 
-from utils.helpers import convert_shorthand
+from utils.helpers import parse_shorthand, file_sha1
+
+YEAR_SHEETS = [str(i) for i in range(2015, 2025)]
+EVENT_COLUMNS = ['datetime', 'events', 'tier', 'actual', 'consensus', 'previous', 'forecast']
+SHEET_CACHE_MANIFEST = 'sheets.json'
+# Bump when format_year_sheet or the cached file layout changes: the sheets are then parsed and cached again
+SHEET_CACHE_VERSION = 1
+
+
+def _is_tier_sheet(sheet):
+    return 'tier' in str(sheet).strip().lower()
+
+
+def _lower_events(events):
+    # Event names as the tier/flag keys are matched against
+    return events.astype(str).str.strip().str.lower()
+
+
+def _contains_any(lowered_events, keys):
+    """uint8 array: 1 where the event name contains any of keys (one compiled alternation regex)."""
+    keys = [re.escape(str(key).strip().lower()) for key in keys]
+    if not keys:
+        return np.zeros(len(lowered_events), dtype=np.uint8)
+    pattern = re.compile("|".join(keys))
+    return lowered_events.str.contains(pattern).to_numpy(dtype=np.uint8)
+
     
 class Events:
     """Combines Events from Economic Events sheet and converts the timestamp to US/Eastern.
     """
     def __init__(self,excel,tier_dic={},flag_dic={},**kwargs):
         self.excel=excel
-        self.sheets_dic=pd.read_excel(self.excel,sheet_name=None)   # reads and saves the excel sheet in the form of a dictionary. key = sheet name and value is the table in the sheet as a df.
+        self.sheet_cache_folder=kwargs.get('sheet_cache_folder')
+        self.sheets_dic=self.read_sheets(self.sheet_cache_folder)   # key = sheet name, value = the year sheet formatted by format_year_sheet, or the tier sheet.
         self.flag_dic=flag_dic
         self.new_events_folder=kwargs.get('new_events_folder')
         self.add_new_events_dic=kwargs.get('add_new_events_dic')
@@ -21,7 +52,7 @@ class Events:
         if tier_dic=={}:
             tier_sheet='NA'
             for sheet in self.sheets_dic.keys():
-                if 'tier' in str(sheet).strip().lower() or 'tiers' in str(sheet).strip().lower():
+                if _is_tier_sheet(sheet):
                     tier_sheet=sheet
                     break
             if tier_sheet=='NA':
@@ -44,19 +75,70 @@ class Events:
     def __str__(self):
         return f'The selected events excel contains the following sheets: {list(self.sheets_dic.keys())}'
     
+    def read_sheets(self, cache_folder=None):
+        """
+        Reads the sheets used from the workbook: the year sheets, formatted by format_year_sheet, and the tier sheet.
+
+        With a cache_folder, the sheets are saved as parquet in cache_folder/v<SHEET_CACHE_VERSION>_<SHA-1 of the
+        workbook>/ and read back from there while the workbook and the format are unchanged, so the workbook is
+        only parsed after it is edited.
+        """
+        if cache_folder is None:
+            return self.parse_sheets()
+
+        workbook_folder = os.path.join(cache_folder, f"v{SHEET_CACHE_VERSION}_{file_sha1(self.excel)}")
+        try:
+            with open(os.path.join(workbook_folder, SHEET_CACHE_MANIFEST)) as f:
+                manifest = json.load(f)
+            # parquet gives None for missing text: back to NaN, as read_excel has it
+            return {sheet: pd.read_parquet(os.path.join(workbook_folder, name)).fillna(np.nan)
+                    for sheet, name in manifest.items()}
+        except (FileNotFoundError, ValueError):
+            pass
+
+        sheets = self.parse_sheets()
+        # Drop the sheets cached for earlier versions of the workbook or of the format
+        if os.path.isdir(cache_folder):
+            for entry in os.scandir(cache_folder):
+                if entry.is_dir() and os.path.exists(os.path.join(entry.path, SHEET_CACHE_MANIFEST)):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        os.makedirs(workbook_folder, exist_ok=True)
+        manifest = {}
+        for i, (sheet, df) in enumerate(sheets.items()):
+            safe_sheet = re.sub(r'[^\w.-]', '_', str(sheet))
+            name = f"{i:02d}_{safe_sheet}.parquet"
+            df.to_parquet(os.path.join(workbook_folder, name), engine='pyarrow', index=False)
+            manifest[sheet] = name
+        # The manifest is written last: a cache interrupted mid-write is parsed again on the next run
+        tmp_path = os.path.join(workbook_folder, f"{SHEET_CACHE_MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(workbook_folder, SHEET_CACHE_MANIFEST))
+        return sheets
+
+    def parse_sheets(self):
+        sheets = {}
+        for sheet, df in pd.read_excel(self.excel, sheet_name=None).items():
+            if sheet in YEAR_SHEETS:
+                sheets[sheet] = self.format_year_sheet(df)
+            elif _is_tier_sheet(sheet):
+                sheets[sheet] = df.iloc[:, :2]   # events and their tier
+        return sheets
+
     def merge_sheets(self,sheets_dic,tier_dic,flag_dic,change_tiers):
         sheets_list=[]
         for key in (sheets_dic):
-            years=[str(i) for i in range(2015,2025)]
-            if key in (years):
+            if key in (YEAR_SHEETS):
                 sheets_list.append(sheets_dic[key])
         merged_sheet =pd.concat(sheets_list[::-1],ignore_index=True)
         formatted_merged_sheet=self.format_sheet(merged_sheet,change_tiers,tier_dic,flag_dic)
         return formatted_merged_sheet
-    
-                
-    def format_sheet(self,df,change_tiers,tier_dic={},flag_dic={}):
-        
+
+    def format_year_sheet(self,df):
+        """
+        Events of one year sheet in the IST workbook layout (date rows followed by time rows):
+        EVENT_COLUMNS with a tz-aware datetime, a numeric tier (NaN when blank) and the values parsed by parse_shorthand.
+        """
         # Convert TIME->DATETIME
         df.columns = df.columns.str.strip().str.lower()
         df=df.dropna(how='all')
@@ -78,9 +160,17 @@ class Events:
         # Since sheet is as per IST timezone
         df['datetime'] = df['datetime'].dt.tz_localize('Asia/Kolkata')   
 
+        df=df.reindex(columns=EVENT_COLUMNS)
+        df['tier'] = pd.to_numeric(df['tier'], errors='coerce')
+        for col in ['actual', 'consensus', 'previous', 'forecast']:
+            df[col] = parse_shorthand(df[col])
+        return df
+
+    def format_sheet(self,df,change_tiers,tier_dic={},flag_dic={}):
+        """Appends the new events to the merged year sheets, then assigns tiers and flags."""
         # Add new events
         for tz_key in self.add_new_events_dic:
-            df=self.append_new_events(df[['datetime','events','tier' , 'actual' , 'consensus' , 'previous' , 'forecast']], tier_dic , events=self.add_new_events_dic[tz_key],timezone=tz_key) 
+            df=self.append_new_events(df[EVENT_COLUMNS], tier_dic , events=self.add_new_events_dic[tz_key],timezone=tz_key) 
        
         df['year']=(df['datetime'].astype(str).str.split().str[0]).str.split('-').str[0]
 
@@ -90,13 +180,13 @@ class Events:
             df = self.assign_tier(df,tier_dic)
         
         else: #only apply tiers for nan values
-            df.loc[:,'tier'] = df.loc[:,'tier'].fillna(df.apply(lambda row: self.assign_tier_helper(row, tier_dic), axis=1))
+            df.loc[:,'tier'] = df.loc[:,'tier'].fillna(self.tier_values(df['events'], tier_dic))
   
         df=df[['datetime','events','tier' , 'actual' , 'consensus' , 'previous' , 'forecast']]
-        df['actual'] = df['actual'].apply(convert_shorthand)
-        df['previous'] = df['previous'].apply(convert_shorthand)
-        df['consensus'] = df['consensus'].apply(convert_shorthand)
-        df['forecast'] = df['forecast'].apply(convert_shorthand)
+        df['actual'] = parse_shorthand(df['actual'])
+        df['previous'] = parse_shorthand(df['previous'])
+        df['consensus'] = parse_shorthand(df['consensus'])
+        df['forecast'] = parse_shorthand(df['forecast'])
 
         # Add flags (IND)
         finaldf=self.assign_flag(df,flag_dic)
@@ -133,36 +223,35 @@ class Events:
 
 
     def assign_tier(self, finaldf,tier_dic):
-        finaldf['tier'] = finaldf.apply(lambda row: self.assign_tier_helper(row,tier_dic), axis=1)
+        finaldf['tier'] = self.tier_values(finaldf['events'], tier_dic)
         return finaldf
-        
-    def assign_tier_helper(self, row,tier_dic):
-        myevent = str(row['events']).strip().lower()
-        for event_key in tier_dic:
-            if str(event_key).strip().lower() in myevent:
-                return tier_dic[event_key]
-        return 4  # Default value if no match found
+
+    def tier_values(self, events, tier_dic):
+        """
+        Tier of each event: the tier of the first key of tier_dic contained in the event name, 4 if none.
+
+        Consecutive keys with the same tier are matched with one alternation regex. The groups are applied
+        from last to first, so the earliest matching key wins. The tiers are uint8 when they are all whole
+        numbers, float64 otherwise (a tier dictionary read from the Tier sheet has NaN for blank cells).
+        """
+        lowered = _lower_events(events)
+        tiers = np.full(len(lowered), 4, dtype=np.float64)
+        groups = [(tier, [key for key, _ in items]) for tier, items in groupby(tier_dic.items(), key=lambda item: item[1])]
+        for tier, keys in reversed(groups):
+            tiers[_contains_any(lowered, keys) == 1] = tier
+        if np.isfinite(tiers).all() and (tiers == np.round(tiers)).all() and (tiers >= 0).all() and (tiers <= 255).all():
+            tiers = tiers.astype(np.uint8)
+        return pd.Series(tiers, index=events.index)
 
     def assign_flag(self,finaldf, flag_dic):
         if not flag_dic:  # Check if dic is empty
             return finaldf
-        # Apply the helper function row-wise
-        finaldf = finaldf.apply(lambda row: self.assign_flag_helper(row, flag_dic), axis=1)
-        return finaldf
-
-    def assign_flag_helper(self, row, flag_dic):
-        myevent = str(row['events']).strip().lower()
+        finaldf = finaldf.copy()
+        lowered = _lower_events(finaldf['events'])
         for flag_key, flag_condition in flag_dic.items():
-            row[flag_key] = 0
-            for event_key in flag_condition:
-                if str(event_key).strip().lower() in myevent:
-                    row[flag_key] = 1
-                    break      
-        if row['IND_Tier1']==0 and row['IND_Tier2']==0 and row['IND_Tier3']==0:
-            row['IND_Tier4']=1
-        else:
-            row['IND_Tier4']=0        
-        return row
+            finaldf[flag_key] = _contains_any(lowered, flag_condition)
+        finaldf['IND_Tier4'] = ((finaldf['IND_Tier1'] == 0) & (finaldf['IND_Tier2'] == 0) & (finaldf['IND_Tier3'] == 0)).astype(np.uint8)
+        return finaldf
 
     def save_sheet(self,sheet,name='combined.csv'):
         sheet.to_csv(name,index=False)
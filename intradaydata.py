@@ -1,14 +1,20 @@
 import datetime
 from datetime import timedelta
 import pandas as pd
-import yfinance as yf
 from preprocessing import ManipulateTimezone
+from models.ohlc_store import OHLC_STORE_ROOT, high_water_mark
+from price_sources import YahooFinanceSource, interval_timedelta
+
+# Bars re-requested before the stored high-water mark in incremental fetches (late corrections, forming bar)
+FETCH_OVERLAP_BARS = 5
+
+
 class Intraday:
     """
     Import data from yfinance. 
     """
     
-    def __init__(self,tickers=[],interval="",start_intraday= -1,end_intraday= -1):
+    def __init__(self,tickers=[],interval="",start_intraday= -1,end_intraday= -1,source=None):
         self.dict_symbols = {
         "ZN=F":["ZN","10-Year T-Note Futures"],
         "ZB=F":["ZB","30-Year T-Bond Futures"],
@@ -34,6 +40,7 @@ class Intraday:
         self.interval=interval
         self.start_intraday=start_intraday
         self.end_intraday=end_intraday
+        self.source=source if source is not None else YahooFinanceSource() # price_sources.PriceSource serving the bars
 
     def update_dict_symbols(self, new_dict_symbols):
         self.dict_symbols = new_dict_symbols
@@ -44,40 +51,99 @@ class Intraday:
         self.symbols = [i[0] for i in list(self.dict_symbols.values())]
         print('Your Ticker Dictionary:',self.dict_symbols)
 
-    def fetch_data_yfinance(self,specific_tickers=[]): 
+    def fetch_data_yfinance(self,specific_tickers=[],incremental=False,store_root=OHLC_STORE_ROOT,overlap_bars=FETCH_OVERLAP_BARS): 
         """ Extracts Intraday data for specific tickers from Yahoo Finance.
+
+        incremental=True only requests what the OHLC store (models/ohlc_store.py) is missing: from the latest
+        stored timestamp of each (ticker, interval) minus overlap_bars bars, never earlier than the usual window.
+        Tickers not in the store are fetched over the usual window.
         """
+        if incremental and specific_tickers!=[]:
+            return self._fetch_incremental(store_root,overlap_bars)
+
         today = datetime.datetime.now()
         data=pd.DataFrame()
         if self.start_intraday!=-1 and self.end_intraday!=-1: 
             # Both start and end date is specified
             end=(today-timedelta(days=self.end_intraday)).strftime("%Y-%m-%d")
             start = (today - timedelta(days=self.start_intraday)).strftime("%Y-%m-%d")
-            data = yf.download(tickers=self.tickers, start=start, end=end, interval=self.interval)
+            data = self._download(self.tickers, start=start, end=end)
 
         elif self.start_intraday==-1 and self.end_intraday==-1:
             # Neither start nor end date is specified
             if(self.interval == '1m'):
-                data = yf.download(tickers=self.tickers, interval=self.interval , period = '7d')
+                data = self._download(self.tickers, period='7d')
             else:
-                data = yf.download(tickers=self.tickers, interval=self.interval)
+                data = self._download(self.tickers)
 
         # Return data for specific tickers as a dictionary 
+        if specific_tickers!=[]:
+            return self._split_by_ticker(data)
+        else:
+            return data
+
+    def _download(self, tickers, start=None, end=None, period=None):
+        symbols=[self.dict_symbols[ticker][0] for ticker in tickers]
+        return self.source.download(tickers, self.interval, symbols=symbols, start=start, end=end, period=period)
+
+    @staticmethod
+    def _split_by_ticker(data):
         try:        
-            if specific_tickers!=[]:
-                alltickerdata={}
-                stackeddata=data.stack(level=0,future_stack=False)
-                stackeddata.index.names=['Datetime','Price']
-                for col in stackeddata.columns:
-                    col_data=stackeddata[col].unstack()
-                    col_data.columns.name = None
-                    alltickerdata[col]=col_data
-                return alltickerdata
-            else:
-                return data
+            alltickerdata={}
+            stackeddata=data.stack(level=0,future_stack=False)
+            stackeddata.index.names=['Datetime','Price']
+            for col in stackeddata.columns:
+                col_data=stackeddata[col].unstack()
+                col_data.columns.name = None
+                alltickerdata[col]=col_data
+            return alltickerdata
         except Exception as e:
             print(e)
             return data
+
+    def _fixed_window(self):
+        """(start, end) of the usual request window as UTC timestamps, None when open-ended."""
+        now = pd.Timestamp.now(tz='UTC')
+        if self.start_intraday!=-1 and self.end_intraday!=-1:
+            start = (now - pd.Timedelta(days=self.start_intraday)).normalize()
+            end = (now - pd.Timedelta(days=self.end_intraday)).normalize()
+            return start, end
+        if self.interval == '1m':
+            return now - pd.Timedelta(days=7), None
+        return None, None
+
+    def _fetch_incremental(self,store_root,overlap_bars):
+        window_start, window_end = self._fixed_window()
+        overlap = overlap_bars * interval_timedelta(self.interval)
+
+        # Tickers sharing a start date are downloaded together
+        groups = {}
+        for ticker in self.tickers:
+            hwm = high_water_mark(store_root, self.dict_symbols[ticker][0], self.interval)
+            start = window_start
+            if hwm is not None:
+                start = hwm - overlap if window_start is None else max(hwm - overlap, window_start)
+                print(f'{ticker} {self.interval}: stored up to {hwm}, fetching from {start}')
+            groups.setdefault(start, []).append(ticker)
+
+        alltickerdata={}
+        for start, tickers in groups.items():
+            kwargs = {}
+            if start is not None:
+                kwargs['start'] = start.to_pydatetime()
+                if window_end is not None:
+                    kwargs['end'] = window_end.to_pydatetime()
+            elif self.interval == '1m':
+                kwargs['period'] = '7d'
+            # A list of tickers gives (Price, Ticker) columns, the layout _split_by_ticker expects
+            data = self._download(tickers, **kwargs)
+            if not data.empty:
+                alltickerdata.update(self._split_by_ticker(data))
+
+        # Nothing new for a ticker is an empty frame, so callers still carry its stored history forward
+        for ticker in self.tickers:
+            alltickerdata.setdefault(ticker, pd.DataFrame())
+        return alltickerdata
         
     @classmethod
     def data_acquisition(self,cleandata):
@@ -4,14 +4,19 @@ import numpy as np
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 import traceback as trb
+from price_sources import fetch_investing_table
 
 class Intraday_Investing:
     
-    def __init__(self,url,interval):
+    def __init__(self,url,interval,source=None,symbol='FGBL'):
         self.url=url
         self.interval=interval
+        self.source=source # price_sources.PriceSource to read the bars from instead of scraping investing.com
+        self.symbol=symbol
     
     def fetch_data_investing(self):
+        if self.source is not None:
+            return self.FetchFromSource()
         MaxAttempts=20
         for _ in range(MaxAttempts):
             try:
@@ -84,6 +89,11 @@ class Intraday_Investing:
         return self.ExportCSV(fgbl_columns,fgbl_row_data,interval)
 
 
+    def FetchFromSource(self):
+        """Same output as StartWebScrapper, built from the source's bars formatted like the scraped table rows."""
+        return fetch_investing_table(self.source,self.symbol,self.interval,self.ExportCSV)
+
+
     def ExportCSV(self,table_heading_list,table_row_list,interval):
         table_new_row_list=[]
         for row in table_row_list:
@@ -9,9 +9,40 @@ from .constants import (
     PERCENTAGE_EVENTS,
 )
 
+from .catalog import (
+    DatasetCatalog,
+    find_dataset,
+    resolve_dataset,
+)
+
+from .ohlc_store import (
+    OHLC_STORE_ROOT,
+    read_ohlc,
+    write_ohlc_partitions,
+)
+
+from .processed_schema import (
+    compact_processed_frame,
+    write_processed_parquet,
+)
+
 from .data_loader import (
     get_data,
     get_price_movt,
+    get_data_cache_info,
+    clear_data_cache,
+)
+
+from .event_index import (
+    clean_event_key,
+    event_name_mask,
+    index_events,
+)
+
+from .event_store import (
+    build_event_store,
+    write_event_store,
+    load_event_store,
 )
 
 from .event_processor import (
@@ -21,7 +52,9 @@ from .event_processor import (
 )
 
 from .session_utils import (
+    SESSION_BOUNDARIES,
     get_session,
+    label_sessions,
 )
 
 from .returns_calculator import (
@@ -32,3 +65,7 @@ from .event_returns import (
     calc_event_spec_returns,
 )
 
+from .window_aggregation import (
+    aggregate_ohlc_windows,
+)
+
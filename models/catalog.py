@@ -0,0 +1,192 @@
+"""
+Dataset catalog for DistroDashboard.
+Indexes the data files under the data folders by (instrument, interval, kind, start, end)
+so loaders look files up by exact fields instead of scanning folders for substrings.
+"""
+
+import os
+import re
+import threading
+from typing import NamedTuple, Optional
+
+INTERVAL_PATTERN = r"\d+(?:m|h|d|wk|mo)"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+
+# (kind, regex) tried in order. Every regex is anchored, so '1m' never matches '1mo' and
+# an instrument never matches part of a date.
+FILE_PATTERNS = [
+    # Intraday_data_files_pq: Intraday_data_ZN_1h_2022-12-20_to_2026-02-06.parquet
+    ("raw", re.compile(
+        rf"^Intraday_data_(?P<instrument>[A-Za-z0-9]+)_(?P<interval>{INTERVAL_PATTERN})_"
+        rf"(?P<start>{DATE_PATTERN})_to_(?P<end>{DATE_PATTERN})\.(?P<ext>parquet|csv)$")),
+    # Daily_backup_files_pq: Intraday_ZN_1m_2026-02-02_to_2026-02-06.parquet
+    ("backup", re.compile(
+        rf"^Intraday_(?P<instrument>[A-Za-z0-9]+)_(?P<interval>{INTERVAL_PATTERN})_"
+        rf"(?P<start>{DATE_PATTERN})_to_(?P<end>{DATE_PATTERN})\.(?P<ext>parquet|csv)$")),
+    # Intraday_data_files_processed_folder_pq: ZN_1h[_filtered_dates]_events_tagged_target_tz[_nonevents].parquet
+    ("processed", re.compile(
+        rf"^(?P<instrument>[A-Za-z0-9]+)_(?P<interval>{INTERVAL_PATTERN})(?P<filtered>_filtered_dates)?"
+        r"_events_tagged_target_tz(?P<nonevents>_nonevents)?\.(?P<ext>parquet|csv)$")),
+    # Events calendar: EconomicEventsSheet15-24_2015-01-02_to_2026-02-17_combined[_target_tz].csv
+    ("calendar", re.compile(
+        rf"^(?P<source>[^_]+)_(?P<start>{DATE_PATTERN})_to_(?P<end>{DATE_PATTERN})_combined"
+        r"(?P<target_tz>_target_tz)?\.(?P<ext>parquet|csv)$")),
+]
+
+
+class DatasetEntry(NamedTuple):
+    instrument: Optional[str]
+    interval: Optional[str]
+    kind: str
+    start: Optional[str]
+    end: Optional[str]
+    file_type: str
+    path: str
+    source: Optional[str] = None
+
+    @property
+    def kind_words(self):
+        return set(self.kind.split("_"))
+
+    def match_score(self, args_list):
+        """
+        Number of kind words not asked for (lower = more specific match), or None if any arg doesn't match.
+
+        An arg matches when it equals the instrument, the interval or one of the kind words.
+        For calendar files it may also be a prefix of the source workbook name.
+        """
+        words = self.kind_words
+        for arg in args_list:
+            if arg in (self.instrument, self.interval) or arg in words:
+                continue
+            if self.source is not None and self.source.startswith(arg):
+                continue
+            return None
+        return len(words - set(args_list))
+
+
+def parse_file_name(folder, file_name):
+    """Parse a data file name into a DatasetEntry, or None if it isn't a dataset file."""
+    for family, pattern in FILE_PATTERNS:
+        match = pattern.match(file_name)
+        if not match:
+            continue
+        fields = match.groupdict()
+        if family == "processed":
+            kind = "events_tagged"
+            if fields["filtered"]:
+                kind += "_filtered_dates"
+            if fields["nonevents"]:
+                kind += "_nonevents"
+        elif family == "calendar":
+            kind = "combined_target_tz" if fields["target_tz"] else "combined"
+        else:
+            kind = family
+        return DatasetEntry(
+            instrument=fields.get("instrument"),
+            interval=fields.get("interval"),
+            kind=kind,
+            start=fields.get("start"),
+            end=fields.get("end"),
+            file_type="." + fields["ext"],
+            path=os.path.join(folder, file_name),
+            source=fields.get("source"),
+        )
+    return None
+
+
+class DatasetCatalog:
+    """
+    In-memory index of the data folders.
+
+    A folder is re-listed only when its directory stat (inode, mtime) changes, and only file names
+    not seen before are parsed, so a lookup normally costs one os.stat and a dict access.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._folder_state = {}   # folder -> (st_ino, st_mtime_ns)
+        self._folder_entries = {}  # folder -> {file name: DatasetEntry}
+        self._index = {}  # (folder, instrument, interval, kind, file_type) -> DatasetEntry
+
+    def refresh(self, folder):
+        """Bring the index of folder up to date with the directory contents."""
+        folder = os.path.normpath(folder)
+        try:
+            stat = os.stat(folder)
+        except FileNotFoundError:
+            with self._lock:
+                self._drop_folder(folder)
+            return
+        state = (stat.st_ino, stat.st_mtime_ns)
+
+        with self._lock:
+            if self._folder_state.get(folder) == state:
+                return
+
+            known = self._folder_entries.get(folder, {})
+            entries = {}
+            for file in os.scandir(folder):
+                if not file.is_file():
+                    continue
+                entry = known.get(file.name) or parse_file_name(folder, file.name)
+                if entry is not None:
+                    entries[file.name] = entry
+
+            self._drop_folder(folder)
+            self._folder_entries[folder] = entries
+            # If a key is present twice (e.g. old and new date range), the latest end date wins
+            for entry in sorted(entries.values(), key=lambda e: (e.end or "", e.path)):
+                self._index[(folder, entry.instrument, entry.interval, entry.kind, entry.file_type)] = entry
+            self._folder_state[folder] = state
+
+    def _drop_folder(self, folder):
+        self._folder_state.pop(folder, None)
+        self._folder_entries.pop(folder, None)
+        for key in [k for k in self._index if k[0] == folder]:
+            del self._index[key]
+
+    def find(self, folder, instrument, interval, kind="raw", file_type=".parquet"):
+        """O(1) lookup of the dataset (instrument, interval, kind) in folder. Returns a DatasetEntry or None."""
+        folder = os.path.normpath(folder)
+        self.refresh(folder)
+        return self._index.get((folder, instrument, interval, kind, file_type))
+
+    def resolve(self, folder, args_list, file_type=".parquet"):
+        """
+        Find the dataset in folder matching every arg in args_list (see DatasetEntry.match_score).
+
+        Arg order doesn't matter. If several datasets match, the most specific one (fewest extra kind words)
+        wins, then the latest end date, so the answer doesn't depend on directory listing order.
+        """
+        folder = os.path.normpath(folder)
+        self.refresh(folder)
+        matches = []
+        for entry in self._folder_entries.get(folder, {}).values():
+            if entry.file_type != file_type:
+                continue
+            score = entry.match_score(args_list)
+            if score is not None:
+                matches.append((score, entry))
+        if not matches:
+            return None
+        best_score = min(score for score, _ in matches)
+        candidates = [entry for score, entry in matches if score == best_score]
+        return max(candidates, key=lambda e: (e.end or "", e.path))
+
+    def entries(self, folder):
+        folder = os.path.normpath(folder)
+        self.refresh(folder)
+        return list(self._folder_entries.get(folder, {}).values())
+
+
+# Process-wide catalog shared by all loaders
+CATALOG = DatasetCatalog()
+
+
+def find_dataset(folder, instrument, interval, kind="raw", file_type=".parquet"):
+    return CATALOG.find(folder, instrument, interval, kind, file_type)
+
+
+def resolve_dataset(folder, args_list, file_type=".parquet"):
+    return CATALOG.resolve(folder, args_list, file_type)
@@ -4,24 +4,228 @@ Functions moved here from core/data_loader.py.
 """
 
 import os
+import threading
+from collections import OrderedDict
 import pandas as pd
 import psycopg2
+from models.catalog import resolve_dataset
+from models.ohlc_store import (OHLC_STORE_ROOT, OHLC_EXPORT_FOLDER, high_water_mark, low_water_mark, read_ohlc,
+                               store_signature)
+from utils.result_cache import file_fingerprint
+
+# =============================================================================
+# In-process LRU cache of loaded frames
+# =============================================================================
+
+DATA_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # total in-memory size of cached frames
+
+_data_cache = OrderedDict()  # (source, version, columns, time_range) -> (DataFrame, nbytes)
+_data_cache_lock = threading.Lock()
+_data_cache_stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+
+def _read_file(path, file_type, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    if file_type == ".parquet":
+        # Column projection + predicate on time_col: pyarrow skips row groups whose min/max
+        # statistics fall outside the range and filters the remaining rows. The file is memory-mapped.
+        filters = None
+        if time_range is not None:
+            start, end = time_range
+            filters = [(time_col, op, ts) for op, ts in ((">=", start), ("<=", end)) if ts is not None]
+        return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None, memory_map=True)
+    elif file_type == ".csv":
+        data = pd.read_csv(path, usecols=columns)
+        if time_range is not None:
+            start, end = time_range
+            times = pd.to_datetime(data[time_col], utc=True)
+            mask = pd.Series(True, index=data.index)
+            if start is not None:
+                mask &= times >= pd.Timestamp(start)
+            if end is not None:
+                mask &= times <= pd.Timestamp(end)
+            data = data[mask]
+        return data
+    return pd.DataFrame()
+
+
+def _copy_on_write():
+    # pandas 2.2 also accepts "warn", which only warns: copy-on-write is enforced only by True
+    return int(pd.__version__.split(".")[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _caller_copy(data):
+    # With copy-on-write (the default from pandas 3) a shallow copy shares the cached data and is still safe.
+    # Without it, in-place writes on a shallow copy (df.loc[mask, col] = ...) would change the cached frame.
+    return data.copy(deep=not _copy_on_write())
+
+
+def _read_through_cache(source, version, columns, time_range, time_col, load):
+    """
+    Look (source, version, columns, time_range) up in the LRU cache, calling load() on a miss.
+    A new version of a source is a miss and drops the cached frames of its older versions.
+    """
+    columns_key = tuple(columns) if columns is not None else None
+    range_key = (time_col, tuple(time_range)) if time_range is not None else None
+    key = (source, version, columns_key, range_key)
+
+    with _data_cache_lock:
+        entry = _data_cache.get(key)
+        if entry is not None:
+            _data_cache.move_to_end(key)
+            _data_cache_stats["hits"] += 1
+            return _caller_copy(entry[0])
+        _data_cache_stats["misses"] += 1
+
+    data = load()
+    nbytes = int(data.memory_usage(index=True, deep=True).sum())
+
+    with _data_cache_lock:
+        # Drop stale versions of the same source before inserting the new one
+        for old_key in [k for k in _data_cache if k[0] == source and k[1] != version]:
+            _data_cache_stats["bytes"] -= _data_cache.pop(old_key)[1]
+        if key not in _data_cache and nbytes <= DATA_CACHE_MAX_BYTES:
+            _data_cache[key] = (data, nbytes)
+            _data_cache_stats["bytes"] += nbytes
+        while _data_cache_stats["bytes"] > DATA_CACHE_MAX_BYTES:
+            _, (_, evicted_bytes) = _data_cache.popitem(last=False)
+            _data_cache_stats["bytes"] -= evicted_bytes
+
+    return _caller_copy(data)
+
+
+def read_cached(path, file_type, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    """
+    Read a data file through the process-wide LRU cache.
+
+    The key is (resolved path, mtime_ns, columns, time_range), so a rewritten file is a miss and is read again.
+    Every call returns a copy of the cached frame, so callers can modify it freely (see _caller_copy).
+    """
+    resolved = os.path.realpath(path)
+    return _read_through_cache(resolved, os.stat(resolved).st_mtime_ns, columns, time_range, time_col,
+                               lambda: _read_file(resolved, file_type, columns, time_range, time_col))
+
+
+def _read_store(instrument, interval, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    start, end = time_range if time_range is not None else (None, None)
+    # read_ohlc always restores the Datetime index, so it is not a column to ask for
+    if columns is not None:
+        columns = [col for col in columns if col != 'Datetime']
+    return read_ohlc(OHLC_STORE_ROOT, instrument, interval, start, end, columns=columns, time_col=time_col)
+
+
+def read_store_cached(instrument, interval, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    """read_ohlc through the LRU cache, keyed on the store files' (path, mtime_ns, size)."""
+    source = ("store", os.path.realpath(OHLC_STORE_ROOT), instrument, interval)
+    return _read_through_cache(source, store_signature(OHLC_STORE_ROOT, instrument, interval), columns, time_range,
+                               time_col, lambda: _read_store(instrument, interval, columns, time_range, time_col))
+
+
+def get_data_cache_info():
+    """Hit/miss counters and current size of the get_data cache."""
+    with _data_cache_lock:
+        lookups = _data_cache_stats["hits"] + _data_cache_stats["misses"]
+        return {
+            "hits": _data_cache_stats["hits"],
+            "misses": _data_cache_stats["misses"],
+            "hit_rate": _data_cache_stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(_data_cache),
+            "bytes": _data_cache_stats["bytes"],
+        }
+
+
+def clear_data_cache():
+    with _data_cache_lock:
+        _data_cache.clear()
+        _data_cache_stats.update(hits=0, misses=0, bytes=0)
+
+
+# =============================================================================
+# Data access
+# =============================================================================
+
+def get_data(folder_name , args_list , file_type, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    """
+    Load the dataset in folder_name matching every string in args_list (instrument, interval, kind words),
+    as resolved by the dataset catalog (models/catalog.py). Returns an empty DataFrame if nothing matches.
+
+    Args:
+        columns (list, optional): Only read these columns (parquet column projection / csv usecols).
+        time_range (tuple, optional): (start, end) timestamps, inclusive, either may be None.
+            Only rows with start <= time_col <= end are read.
+        time_col (str): Timestamp column used by time_range.
+    """
+    entry = resolve_dataset(folder_name, args_list, file_type)
+    if entry is None:
+        return pd.DataFrame()
+    return read_dataset(entry, columns, time_range, time_col)
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tz is None else ts
+
+
+def _store_covers(instrument, interval, start_timestamp, end_timestamp):
+    """True when the OHLC store has bars from at or before start_timestamp through at or past end_timestamp."""
+    first = low_water_mark(OHLC_STORE_ROOT, instrument, interval)
+    last = high_water_mark(OHLC_STORE_ROOT, instrument, interval)
+    if first is None or last is None:
+        return False
+    return _utc(first) <= _utc(start_timestamp) and _utc(last) >= _utc(end_timestamp)
+
+def store_is_current(entry):
+    """
+    True when entry is a raw intraday parquet of OHLC_EXPORT_FOLDER whose whole date range is in the OHLC store.
+
+    Incremental ingests append to the store and only re-export the monolithic file on compaction,
+    so for these datasets the store is the up-to-date copy.
+    """
+    if entry.kind != "raw" or entry.file_type != ".parquet":
+        return False
+    if os.path.realpath(os.path.dirname(entry.path)) != os.path.realpath(OHLC_EXPORT_FOLDER):
+        return False
+    first = low_water_mark(OHLC_STORE_ROOT, entry.instrument, entry.interval)
+    last = high_water_mark(OHLC_STORE_ROOT, entry.instrument, entry.interval)
+    if first is None or last is None:
+        return False
+    return str(_utc(first).date()) <= entry.start and str(_utc(last).date()) >= entry.end
+
+
+def read_dataset(entry, columns=None, time_range=None, time_col='US/Eastern Timezone'):
+    """Read a catalog entry through the LRU cache, raw intraday data from the OHLC store when it is current."""
+    if store_is_current(entry):
+        return read_store_cached(entry.instrument, entry.interval, columns, time_range, time_col)
+    return read_cached(entry.path, entry.file_type, columns, time_range, time_col)
+
+
+def load_raw_prices(entry):
+    """Full bars of a raw intraday entry, bypassing the cache (batch jobs): from the OHLC store when it is current."""
+    if store_is_current(entry):
+        return _read_store(entry.instrument, entry.interval)
+    return pd.read_parquet(entry.path, engine='pyarrow')
+
+
+def dataset_fingerprint(entry):
+    """Changes whenever the data read_dataset / load_raw_prices return for entry changes (for result caches)."""
+    if store_is_current(entry):
+        return ("store", entry.instrument, entry.interval,
+                store_signature(OHLC_STORE_ROOT, entry.instrument, entry.interval))
+    return file_fingerprint(entry.path)
 
-def get_data(folder_name , args_list , file_type):
-    data = pd.DataFrame()
-    for file in os.scandir(folder_name):
-        if file.name.endswith(file_type) and all(x in file.name for x in args_list):
-            if(file_type == ".parquet"):
-                data = pd.read_parquet(file.path , engine = 'pyarrow')
-            elif (file_type == ".csv"):
-                data = pd.read_csv(file.path)
-            break
-    return data
 
 def get_price_movt(start_timestamp , end_timestamp , x , y , folder):
-    price_data = get_data(folder , [x,y] , ".parquet")
-    price_data = price_data[(price_data['US/Eastern Timezone'] >= start_timestamp) &
-                            (price_data['US/Eastern Timezone'] <= end_timestamp)]
+    columns = ['US/Eastern Timezone', 'Open', 'High', 'Low', 'Close']
+
+    # Prefer the partitioned OHLC store: only the year files / row groups around the window are read.
+    # It is used only when it covers the whole window (it may be seeded later or lag the file).
+    price_data = pd.DataFrame()
+    entry = resolve_dataset(folder, [x, y], ".parquet")
+    if entry is not None and entry.kind == "raw" and _store_covers(entry.instrument, entry.interval,
+                                                                     start_timestamp, end_timestamp):
+        price_data = read_ohlc(OHLC_STORE_ROOT, entry.instrument, entry.interval, start_timestamp, end_timestamp,
+                               columns=columns, time_col='US/Eastern Timezone')
+    if price_data.empty:
+        price_data = get_data(folder , [x,y] , ".parquet", columns=columns,
+                              time_range=(start_timestamp, end_timestamp))
 
     return [price_data['Open'].iloc[0] , price_data['High'].max() , price_data['Close'].iloc[-1] , price_data['Low'].min()]
 
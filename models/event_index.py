@@ -0,0 +1,89 @@
+"""
+Event-name index for DistroDashboard.
+Maps the cleaned event names of the event store to their parent event (EVENTS) and sub-event
+(SUB_EVENT_DICT), and answers "which rows start with these sub-events" through the integer codes
+of the categorical cleaned_events column, so each distinct name is matched once.
+"""
+
+import numpy as np
+import pandas as pd
+from models.constants import EVENTS, SUB_EVENT_DICT
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def clean_event_key(events):
+    """Event names as matched by the event filters: stripped, lowercase, without spaces."""
+    return events.astype(str).str.strip().str.lower().str.replace(" ", "", regex=False)
+
+
+def _clean_name(name):
+    return name.strip().lower().replace(" ", "")
+
+
+# (cleaned sub-event, parent event) in SUB_EVENT_DICT order
+SUB_EVENT_KEYS = [(_clean_name(sub), parent) for parent, subs in SUB_EVENT_DICT.items() for sub in subs]
+
+
+def _as_categorical(cleaned_events):
+    cleaned_events = cleaned_events if isinstance(cleaned_events, pd.Series) else pd.Series(cleaned_events)
+    if not isinstance(cleaned_events.dtype, pd.CategoricalDtype):
+        cleaned_events = cleaned_events.astype("category")
+    return cleaned_events
+
+
+def _lookup(cleaned_events, per_name):
+    """Row values of a per-category array (one value per distinct name), through the category codes."""
+    codes = cleaned_events.cat.codes.to_numpy()
+    return per_name[codes]
+
+
+def month_suffix_match(names, key):
+    """
+    Boolean array: names starting with key whose next 3 characters are a month, or that have fewer than
+    3 characters after it (the rule check_bounds uses, so 'cpis.adec' is 'CPI s.a', not 'CPI').
+    """
+    names = pd.Series(names, dtype=object)
+    suffix = names.str.slice(len(key), len(key) + 3)
+    return (names.str.startswith(key) & (suffix.str.len().lt(3) | suffix.isin(MONTHS))).to_numpy(dtype=bool)
+
+
+def event_name_mask(cleaned_events, sub_events):
+    """
+    Boolean array: rows whose cleaned event name starts with any of sub_events (names as in SUB_EVENT_DICT).
+
+    The prefixes are matched once per category of cleaned_events and looked up by code.
+    """
+    cleaned_events = _as_categorical(cleaned_events)
+    keys = tuple(_clean_name(sub) for sub in sub_events)
+    names = pd.Series(cleaned_events.cat.categories, dtype=object)
+    # One extra False entry, read by the code -1 of missing names
+    per_name = np.append(names.str.startswith(keys).to_numpy(dtype=bool), False)
+    return _lookup(cleaned_events, per_name)
+
+
+def index_events(cleaned_events):
+    """
+    Parent event and sub-event of each row.
+
+    The parent is the EVENTS entry with a sub-event the name starts with. The sub-event is the cleaned
+    SUB_EVENT_DICT entry matched with the month-suffix rule (see month_suffix_match). Both are NaN
+    when nothing matches; where several entries match, the first in SUB_EVENT_DICT order wins.
+
+    Returns:
+        tuple: (parent_event, sub_event) categorical Series with the index of cleaned_events.
+    """
+    cleaned_events = _as_categorical(cleaned_events)
+    names = pd.Series(cleaned_events.cat.categories, dtype=object)
+    parent_codes = np.full(len(names) + 1, -1, dtype=np.int16)
+    sub_codes = np.full(len(names) + 1, -1, dtype=np.int16)
+
+    sub_categories = list(dict.fromkeys(key for key, _ in SUB_EVENT_KEYS))
+    for key, parent in reversed(SUB_EVENT_KEYS):
+        parent_codes[:-1][names.str.startswith(key).to_numpy(dtype=bool)] = EVENTS.index(parent)
+        sub_codes[:-1][month_suffix_match(names, key)] = sub_categories.index(key)
+
+    parent_event = pd.Categorical.from_codes(_lookup(cleaned_events, parent_codes), categories=EVENTS)
+    sub_event = pd.Categorical.from_codes(_lookup(cleaned_events, sub_codes), categories=sub_categories)
+    return (pd.Series(parent_event, index=cleaned_events.index, name="parent_event"),
+            pd.Series(sub_event, index=cleaned_events.index, name="sub_event"))
@@ -3,8 +3,10 @@ Event processing functions for DistroDashboard.
 Functions moved here from core/event_filters.py.
 """
 
+import numpy as np
 import pandas as pd
 from pandas.tseries.offsets import MonthEnd
+from models.event_index import clean_event_key, event_name_mask
 
 
 # =============================================================================
@@ -40,55 +42,56 @@ def filter_event_df(event_ts, selected_event, sub_event_dic, window_size,
 
     df = event_ts.copy()
 
-    # Cleaned event labels
-    df["cleaned_events"] = df["events"].astype(str).str.strip().str.lower().str.replace(" ", "")
-
-    # Sub-events for the selected event
-    sub_events_cleaned = [s.strip().lower().replace(" ", "") for s in sub_event_dic[selected_event]]
+    # Cleaned event labels (precomputed in the event store)
+    if "cleaned_events" not in df:
+        df["cleaned_events"] = clean_event_key(df["events"])
 
     # Keep only rows that are part of the selected sub-event set
-    mask_selected = df["cleaned_events"].str.startswith(tuple(sub_events_cleaned))
+    mask_selected = event_name_mask(df["cleaned_events"], sub_event_dic[selected_event])
     df_selected = df[mask_selected].copy()
     print("LEN df_selected: " , len(df_selected))
     if df_selected.empty:
         return pd.DataFrame()
 
-    # Prepare time window boundaries
-    df_selected["t_minus"] = df_selected["datetime"] - pd.Timedelta(hours=window_size)
-    df_selected["t_plus"] = df_selected["datetime"] + pd.Timedelta(hours=window_size)
+    # Sorted event times (NaT never falls inside a window, so it is left out of the sweep)
+    all_ns = df["datetime"].to_numpy(dtype="datetime64[ns]").view("int64")
+    sel_ns = df_selected["datetime"].to_numpy(dtype="datetime64[ns]").view("int64")
+    nat = np.iinfo(np.int64).min
+    valid_all = all_ns != nat
+    order = np.argsort(all_ns[valid_all], kind="stable")
+    sorted_ns = all_ns[valid_all][order]
 
-    # Merge with all events to see what's in each window
-    merged = df_selected.merge(
-            df[["datetime", "cleaned_events", "tier"]],
-            how="cross",
-            suffixes=("", "_nearby")
-        )
+    # Neighbours of each selected event are the sorted rows [lo, hi) inside [t - window, t + window]
+    sel_valid = sel_ns != nat
+    sel_ns = np.where(sel_valid, sel_ns, 0)
+    window_ns = pd.Timedelta(hours=window_size).value
+    lo = np.searchsorted(sorted_ns, sel_ns - window_ns, side="left")
+    hi = np.searchsorted(sorted_ns, sel_ns + window_ns, side="right")
+    hi = np.where(sel_valid, hi, lo)
 
-    # Check if nearby event falls into the window
-    cond_in_window = (merged["datetime_nearby"] >= merged["t_minus"]) & (merged["datetime_nearby"] <= merged["t_plus"])
-    merged = merged[cond_in_window]
+    print("LEN merged: " , int((hi - lo).sum()))
 
-    print("LEN merged: " , len(merged))
+    def any_nearby(flags):
+        # True where at least one neighbour in the window has the flag, via prefix sums over the sorted rows
+        counts = np.concatenate(([0], np.cumsum(np.asarray(flags, dtype=np.int64)[valid_all][order])))
+        return (counts[hi] - counts[lo]) > 0
 
-    # Logic for filtering
-    include_mask = pd.Series(True, index=merged.index)
+    # Logic for filtering (every valid selected event has itself in its window)
+    include_mask = sel_valid & (hi > lo)
 
     if isolate_event:
-        # Exclude if any unwanted tier appears nearby
-        bad_mask = merged["tier"].isin(filter_tier_list)
-        # mark those selected events as False
-        bad_ids = merged.loc[bad_mask, "datetime"].unique()
-        include_mask &= ~merged["datetime"].isin(bad_ids)
+        # Exclude unwanted tiers. As in the original cross-join version, the tier checked is the selected
+        # event's own "tier" (the nearby tier was suffixed "tier_nearby" by the merge), keyed by datetime.
+        bad_ids = df_selected.loc[include_mask & df_selected["tier"].isin(filter_tier_list).to_numpy(), "datetime"].unique()
+        include_mask &= ~df_selected["datetime"].isin(bad_ids).to_numpy()
 
     elif group_events:
         # Require presence of chosen sub-event in the window
-        specific_sub_events = [s.strip().lower().replace(" ", "") for s in sub_event_dic[selected_group_event]]
-        has_required = merged["cleaned_events_nearby"].str.startswith(tuple(specific_sub_events))
-        good_ids = merged.loc[has_required, "datetime"].unique()
-        include_mask &= merged["datetime"].isin(good_ids)
+        has_required = event_name_mask(df["cleaned_events"], sub_event_dic[selected_group_event])
+        include_mask &= any_nearby(has_required)
 
     # Final filtered set
-    filtered_times = merged.loc[include_mask, "datetime"].unique()
+    filtered_times = df_selected.loc[include_mask, "datetime"].unique()
     filtered_df = df[df["datetime"].isin(filtered_times)]
                         
     return filtered_df
@@ -4,9 +4,11 @@ Moved from streamlit_app.py calc_event_spec_returns() function.
 """
 
 import re
-import pandas as pd
 import numpy as np
+import pandas as pd
+from models.event_index import clean_event_key, event_name_mask, index_events
 from models.event_processor import add_start_end_ts, filter_event_df
+from models.window_aggregation import aggregate_ohlc_windows
 
 
 def calc_event_spec_returns(
@@ -65,25 +67,22 @@ def calc_event_spec_returns(
         return pd.DataFrame(), None, "None of the instances of the selected event satisfy the event filtering conditions."
 
     # ---SUB-EVENT FILTERING---
-    cleaned_sub_events = [s.replace(" ", "").strip().lower() for s in sub_event_dict[selected_event]]
     cleaned_sub_event_filtering_dict = {
         re.sub(r"\s+", "", k).strip().lower(): v for k, v in sub_event_filtering_dict.items()
     }
 
-    # 2. Keep only relevant sub-events
+    # 2. Keep only relevant sub-events (cleaned names and their sub-event come from the event store)
+    if "sub_event" not in filtered_event_df:
+        filtered_event_df = filtered_event_df.copy()
+        filtered_event_df["cleaned_events"] = clean_event_key(filtered_event_df["events"])
+        filtered_event_df["parent_event"], filtered_event_df["sub_event"] = index_events(filtered_event_df["cleaned_events"])
     event_df = filtered_event_df.loc[
-        filtered_event_df["events"]
-        .astype(str)
-        .str.replace(" ", "")
-        .str.strip()
-        .str.lower()
-        .apply(lambda x: any(x.startswith(sub) for sub in cleaned_sub_events))
+        event_name_mask(filtered_event_df["cleaned_events"], sub_event_dict[selected_event])
     ].copy()
     if event_df.empty:
         return pd.DataFrame(), None, None
 
-    # 3. Clean names and compute deviation
-    event_df["cleaned_events"] = event_df["events"].str.strip().str.lower().str.replace(" ", "")
+    # 3. Compute deviation
     event_df["cons_or_forecast"] = event_df["consensus"].where(
         ~event_df["consensus"].isna(), event_df["forecast"]
     )
@@ -92,37 +91,25 @@ def calc_event_spec_returns(
     sub_event_filtered_df = None
     if sub_event_filter:
 
-        # 4. Create per-row validity for sub-events
-        def check_bounds(row):
-            bounds = None
-            months = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
-            for key in cleaned_sub_event_filtering_dict.keys():
-                event = row["cleaned_events"].lower()
-
-                # Match if event starts with key AND next 3 chars (if present) are a month
-                if event.startswith(key):
-                    suffix = event[len(key):len(key)+3].lower()
-
-                    # check month condition: either no extra chars OR starts with a valid month
-                    if len(suffix) < 3 or suffix in months:
-                        bounds = cleaned_sub_event_filtering_dict[key]
-                        break
-
+        # 4. Per-row validity: the bounds of the row's sub-event (matched with the month-suffix rule
+        # when the event store was built, see models/event_index.py). Rows without bounds pass.
+        pass_bounds = np.ones(len(event_df), dtype=bool)
+        for key, bounds in cleaned_sub_event_filtering_dict.items():
             if not bounds:
-                return True  
-            
+                continue
+            rows = (event_df["sub_event"] == key).to_numpy(dtype=bool)
             lower, upper = bounds
             if pd.isna(lower) or pd.isna(upper):
-                return False
-            return lower <= row["deviation"] <= upper
-
-        event_df["pass_bounds"] = event_df.apply(check_bounds, axis=1)
+                pass_bounds[rows] = False
+            else:
+                pass_bounds[rows] = event_df["deviation"].between(lower, upper).to_numpy(dtype=bool)[rows]
+        event_df["pass_bounds"] = pass_bounds
 
         # 5. Only keep timestamps where all sub-events pass
         pass_counts = event_df.groupby("datetime")["pass_bounds"].agg(list)
         valid_timestamps = [
             dt for dt, lst in pass_counts.items()
-            if len(lst) == len(cleaned_sub_events) and all(lst)
+            if len(lst) == len(sub_event_dict[selected_event]) and all(lst)
         ]
 
         sub_event_filtered_df = event_df[event_df["datetime"].isin(valid_timestamps)]
@@ -136,31 +123,19 @@ def calc_event_spec_returns(
 
     # ---RETURN CALCULATIONS---
 
-    final_df = []
-    for start, end in zip(sub_event_filtered_df["start"], sub_event_filtered_df["end"]):
-        temp_df = ohcl_1h[(ohcl_1h["US/Eastern Timezone"] >= start) & (ohcl_1h["US/Eastern Timezone"] < end)]
-
-        if temp_df.empty:
-            final_df.append([np.nan]*9)
-        else:
-            entry_price = temp_df["Open"].iloc[0]
-            exit_price = temp_df["Close"].iloc[-1]
-            maxi = temp_df["High"].max()
-            mini = temp_df["Low"].min()
-
-            vol_ret = (maxi - mini) * 16
-            abs_ret = abs(exit_price - entry_price) * 16
-            ret = (exit_price - entry_price) * 16
-            final_df.append([vol_ret, abs_ret, ret,
-                             temp_df["US/Eastern Timezone"].iloc[0],
-                             temp_df["US/Eastern Timezone"].iloc[-1],
-                             entry_price, exit_price, maxi, mini])
-
-    final_df = pd.DataFrame(
-        final_df,
-        columns=["Volatility Return", "Absolute Return", "Return",
-                 "Start_Date", "End_Date", "Entry_Price", "Exit_Price", "High", "Low"]
-    )
+    windows = aggregate_ohlc_windows(ohcl_1h, sub_event_filtered_df["start"], sub_event_filtered_df["end"])
+
+    final_df = pd.DataFrame({
+        "Volatility Return": (windows["High"] - windows["Low"]) * 16,
+        "Absolute Return": (windows["Exit_Price"] - windows["Entry_Price"]).abs() * 16,
+        "Return": (windows["Exit_Price"] - windows["Entry_Price"]) * 16,
+        "Start_Date": windows["Start_Date"],
+        "End_Date": windows["End_Date"],
+        "Entry_Price": windows["Entry_Price"],
+        "Exit_Price": windows["Exit_Price"],
+        "High": windows["High"],
+        "Low": windows["Low"],
+    })
 
     final_df.dropna(inplace=True)
     final_df.drop_duplicates(subset=["Start_Date"], keep="first", inplace=True)
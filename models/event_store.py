@@ -0,0 +1,84 @@
+"""
+Event store for DistroDashboard.
+The combined_target_tz events calendar as a typed parquet file, written next to the csv by returns_main:
+one row per (datetime, event) with clean event names, tz-aware US/Eastern timestamps, float values
+(percentage events scaled to percent), the categorical cleaned_events key the event filters match on
+and its parent_event / sub_event index (models/event_index.py).
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from models.constants import PERCENTAGE_EVENTS
+from models.data_loader import get_data
+from models.event_index import clean_event_key, index_events
+from utils.helpers import clean_text, parse_shorthand
+
+EVENT_STORE_FOLDER = "Intraday_data_files_processed_folder_pq"
+EVENT_STORE_ARGS = ['EconomicEventsSheet', 'target']
+EVENT_STORE_TZ = 'US/Eastern'
+VALUE_COLUMNS = ['actual', 'previous', 'consensus', 'forecast']
+# Columns shown in percent for PERCENTAGE_EVENTS
+SCALED_COLUMNS = ['actual', 'consensus', 'forecast']
+FLAG_COLUMNS_PREFIX = "IND_"
+
+
+def _as_small_int(values):
+    """values as uint8 when every one is a whole number in range, else float64 (NaN tiers of a Tier-sheet calendar)."""
+    values = pd.to_numeric(values).astype('float64')
+    array = values.to_numpy()
+    if np.isfinite(array).all() and (array == np.round(array)).all() and (array >= 0).all() and (array <= 255).all():
+        return values.astype('uint8')
+    return values
+
+
+def build_event_store(calendar):
+    """
+    Event store frame from the combined_target_tz calendar (as read from its csv).
+
+    Rows without an event name are dropped (astype(str) would turn them into 'nan' events). Rows with the
+    same datetime and clean event name are merged, keeping the last value of each column.
+    """
+    store = calendar.dropna(subset=['events']).copy()
+    store['events'] = store['events'].astype(str).map(clean_text)
+    for col in VALUE_COLUMNS:
+        store[col] = parse_shorthand(store[col])
+    store['datetime'] = pd.to_datetime(store['datetime'], errors='coerce', utc=True).dt.tz_convert(EVENT_STORE_TZ)
+
+    store = store.sort_values(['datetime', 'events']).groupby(['datetime', 'events'], as_index=False).last()
+
+    store['cleaned_events'] = clean_event_key(store['events']).astype('category')
+    store['parent_event'], store['sub_event'] = index_events(store['cleaned_events'])
+    normalized = [re.escape(e.strip().lower().replace(" ", "")) for e in PERCENTAGE_EVENTS]
+    is_percentage = store['cleaned_events'].str.match(r'^(?:' + '|'.join(normalized) + ')', na=False)
+    store.loc[is_percentage, SCALED_COLUMNS] = store.loc[is_percentage, SCALED_COLUMNS].mul(100)
+
+    # Tiers and flags are small integers, stored as uint8 unless some are missing (same rule as Events.tier_values)
+    for col in store.columns:
+        if col == 'tier' or col.startswith(FLAG_COLUMNS_PREFIX):
+            store[col] = _as_small_int(store[col])
+    return store
+
+
+def write_event_store(calendar, path):
+    """
+    Build the event store from the combined_target_tz calendar and write it to path.
+
+    Returns:
+        pd.DataFrame: The event store that was written.
+    """
+    store = build_event_store(calendar)
+    store.to_parquet(path, engine='pyarrow', index=False)
+    return store
+
+
+def load_event_store(folder=EVENT_STORE_FOLDER):
+    """
+    The latest event store in folder (through the get_data cache), ready to use as is.
+
+    Falls back to building it from the combined_target_tz csv when no store has been written yet.
+    """
+    store = get_data(folder, EVENT_STORE_ARGS, ".parquet")
+    if store.empty:
+        store = build_event_store(get_data(folder, EVENT_STORE_ARGS, ".csv"))
+    return store
@@ -0,0 +1,369 @@
+"""
+Partitioned OHLC store for DistroDashboard.
+Keeps the intraday price history as a hive layout, one directory per year:
+
+    Intraday_data_store_pq/instrument=ZN/interval=1m/year=2025/part-0.parquet
+                                                              /seg-000001.parquet ...
+
+part-0 holds the compacted history of the year and seg-N files hold bars appended since the last
+compaction. When files overlap, later files win (part-0 < seg-000001 < seg-000002 ...).
+
+Paths don't change when the data is refreshed, and time-range reads only open the years
+(and row groups) that overlap the range instead of loading the full series.
+"""
+
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from models.catalog import find_dataset
+
+OHLC_STORE_ROOT = "Intraday_data_store_pq"
+# Folder of the monolithic Intraday_data_* parquets the store mirrors (see export_ohlc_file)
+OHLC_EXPORT_FOLDER = "Intraday_data_files_pq"
+
+# Rows per parquet row group. Rows are sorted by time, so each row group covers a short time span
+# and its min/max statistics let pyarrow skip it for ranges it doesn't overlap (~2 weeks of 1m bars).
+ROW_GROUP_SIZE = 20_000
+
+# A year partition is compacted back into part-0 once it holds this many appended segments
+COMPACT_SEGMENTS = 24
+
+PART_FILE_NAME = "part-0.parquet"
+SEGMENT_PREFIX = "seg-"
+
+
+def partition_dir(root, instrument, interval, year=None):
+    path = os.path.join(root, f"instrument={instrument}", f"interval={interval}")
+    if year is not None:
+        path = os.path.join(path, f"year={year}")
+    return path
+
+
+def _segment_files(year_dir):
+    """Appended segment files of a year partition, oldest first."""
+    if not os.path.isdir(year_dir):
+        return []
+    names = [e.name for e in os.scandir(year_dir)
+             if e.is_file() and e.name.startswith(SEGMENT_PREFIX) and e.name.endswith(".parquet")]
+    return [os.path.join(year_dir, name) for name in sorted(names)]
+
+
+def _partition_files(year_dir):
+    """All data files of a year partition in precedence order: part-0, then segments oldest first."""
+    part = os.path.join(year_dir, PART_FILE_NAME)
+    files = [part] if os.path.exists(part) else []
+    return files + _segment_files(year_dir)
+
+
+def list_partitions(root, instrument, interval):
+    """Sorted list of the years stored for (instrument, interval). Empty if the dataset isn't in the store."""
+    base = partition_dir(root, instrument, interval)
+    if not os.path.isdir(base):
+        return []
+    years = []
+    for entry in os.scandir(base):
+        if entry.is_dir() and entry.name.startswith("year=") and _partition_files(entry.path):
+            years.append(int(entry.name.split("=", 1)[1]))
+    return sorted(years)
+
+
+def store_files(root, instrument, interval):
+    """Every data file of (instrument, interval), years in order, each in precedence order."""
+    return [path for year in list_partitions(root, instrument, interval)
+            for path in _partition_files(partition_dir(root, instrument, interval, year))]
+
+
+def store_signature(root, instrument, interval):
+    """(path, mtime_ns, size) of every data file: changes whenever bars are appended, compacted or rewritten."""
+    signature = []
+    for path in store_files(root, instrument, interval):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:  # merged away by a compaction since the listing
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def count_segments(root, instrument, interval):
+    """Number of appended (not yet compacted) segment files per year."""
+    return {year: len(_segment_files(partition_dir(root, instrument, interval, year)))
+            for year in list_partitions(root, instrument, interval)}
+
+
+def _utc_years(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    return index.year
+
+
+def _write_atomic(df, path, row_group_size=ROW_GROUP_SIZE, schema=None):
+    """Write df to path through a temp file. With a schema, the columns are cast to it (e.g. us -> ns timestamps)."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if schema is None:
+        df.to_parquet(tmp_path, engine="pyarrow", row_group_size=row_group_size)
+    else:
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=True), tmp_path,
+                       row_group_size=row_group_size)
+    os.replace(tmp_path, path)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_ohlc_partitions(df, root, instrument, interval, since=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write an OHLC frame (DatetimeIndex) into the store, one file per UTC year.
+
+    Each year file is written to a temp file and swapped in with os.replace, so readers never see a
+    partial partition. Segments already in a rewritten year are superseded and removed.
+
+    Args:
+        df (pd.DataFrame): Full history for (instrument, interval), indexed by Datetime.
+        since (timestamp, optional): Only rewrite the years from since onwards (the years touched by
+            newly fetched data). Ignored when the dataset isn't in the store yet.
+        row_group_size (int): Rows per parquet row group.
+
+    Returns:
+        list: Years written.
+    """
+    if df.empty:
+        return []
+
+    df = df.sort_index()
+    years = _utc_years(df.index)
+    first_year = None
+    if since is not None and list_partitions(root, instrument, interval):
+        since = pd.Timestamp(since)
+        first_year = (since.tz_convert("UTC") if since.tz is not None else since).year
+
+    written = []
+    for year in pd.unique(years):
+        if first_year is not None and year < first_year:
+            continue
+        year_dir = partition_dir(root, instrument, interval, year)
+        os.makedirs(year_dir, exist_ok=True)
+        superseded = _segment_files(year_dir)
+        _write_atomic(df[years == year], os.path.join(year_dir, PART_FILE_NAME), row_group_size)
+        _remove_files(superseded)
+        written.append(int(year))
+    return written
+
+
+def _datetime_bound(root, instrument, interval, latest):
+    years = list_partitions(root, instrument, interval)
+    if not years:
+        return None
+    pick = max if latest else min
+    bound = None
+    for path in _partition_files(partition_dir(root, instrument, interval, years[-1] if latest else years[0])):
+        parquet_file = pq.ParquetFile(path)
+        col = parquet_file.schema_arrow.get_field_index("Datetime")
+        metadata = parquet_file.metadata
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(col).statistics
+            if stats is None or not stats.has_min_max:
+                # No statistics written: fall back to reading the column
+                values = pq.read_table(path, columns=["Datetime"]).column(0).to_pandas()
+                value = pick(values)
+            else:
+                value = stats.max if latest else stats.min
+            value = pd.Timestamp(value)
+            bound = value if bound is None else pick(bound, value)
+    return bound
+
+
+def high_water_mark(root, instrument, interval):
+    """
+    Latest Datetime in the store for (instrument, interval), or None if the dataset isn't stored.
+
+    Read from the parquet footer statistics of the last year, so no data pages are loaded.
+    """
+    return _datetime_bound(root, instrument, interval, latest=True)
+
+
+def low_water_mark(root, instrument, interval):
+    """Earliest Datetime in the store for (instrument, interval), or None (footer statistics of the first year)."""
+    return _datetime_bound(root, instrument, interval, latest=False)
+
+
+def _stored_schema(root, instrument, interval, year):
+    """
+    Arrow schema the files of a year partition are written with: the schema of its first file (part-0),
+    or of the latest year's first file for a new year. None if the dataset isn't stored.
+    """
+    years = list_partitions(root, instrument, interval)
+    if not years:
+        return None
+    files = _partition_files(partition_dir(root, instrument, interval, year))
+    if not files:
+        files = _partition_files(partition_dir(root, instrument, interval, years[-1]))
+    return pq.read_schema(files[0])
+
+
+def _changed_rows(new, stored):
+    """Boolean mask of the rows of new that are missing from stored or differ from it (NaN == NaN)."""
+    stored = stored.reindex(index=new.index, columns=new.columns)
+    differs = new.ne(stored) & ~(new.isna() & stored.isna())
+    return differs.any(axis=1) | stored.isna().all(axis=1)
+
+
+def append_ohlc_segment(new_df, root, instrument, interval):
+    """
+    Incrementally add newly fetched bars to the store without rewriting the history.
+
+    Bars after the stored high-water mark are appended as a new segment file. Bars at or before it
+    (the fetch overlap) are compared only against the stored rows of that overlap window, and only
+    the ones that changed (e.g. a bar that was still forming at the previous fetch) are written, so
+    the newer segment overrides them on read.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if new_df.empty:
+        return 0
+    new_df = new_df.sort_index()
+    new_df = new_df[~new_df.index.duplicated(keep="last")]
+
+    hwm = high_water_mark(root, instrument, interval)
+    if hwm is None:
+        write_ohlc_partitions(new_df, root, instrument, interval)
+        return len(new_df)
+
+    overlap = new_df[new_df.index <= hwm]
+    if not overlap.empty:
+        stored = read_ohlc(root, instrument, interval, start=overlap.index[0], end=hwm)
+        overlap = overlap[_changed_rows(overlap, stored)]
+    segment = pd.concat([overlap, new_df[new_df.index > hwm]])
+    if segment.empty:
+        return 0
+
+    years = _utc_years(segment.index)
+    for year in pd.unique(years):
+        year_dir = partition_dir(root, instrument, interval, year)
+        os.makedirs(year_dir, exist_ok=True)
+        existing = _segment_files(year_dir)
+        seq = int(os.path.basename(existing[-1])[len(SEGMENT_PREFIX):-len(".parquet")]) + 1 if existing else 1
+        # Same schema as the stored files, whatever timestamp unit / dtypes this fetch came with
+        schema = _stored_schema(root, instrument, interval, year)
+        _write_atomic(segment[years == year], os.path.join(year_dir, f"{SEGMENT_PREFIX}{seq:06d}.parquet"),
+                      schema=schema)
+    return len(segment)
+
+
+def _read_files(paths, **kwargs):
+    """
+    Read parquet files one by one and concatenate them in the given order.
+
+    Tables are cast to the schema of the first one, so segments written before their schema was pinned
+    to part-0 (e.g. us timestamps next to ns) still concatenate.
+    """
+    tables = [pq.read_table(path, use_pandas_metadata=True, **kwargs) for path in paths]
+    schema = tables[0].schema
+    tables = [table if table.schema.equals(schema) else table.select(schema.names).cast(schema)
+              for table in tables]
+    return pa.concat_tables(tables).to_pandas()
+
+
+def read_ohlc(root, instrument, interval, start=None, end=None, columns=None, time_col="Datetime"):
+    """
+    Read (instrument, interval) from the store, restricted to start <= time_col <= end.
+
+    Year partitions outside the range are never opened, and row groups inside the opened files are
+    skipped by their min/max statistics on time_col.
+
+    Args:
+        start, end (timestamp, optional): Inclusive bounds, timezone-aware. Either may be None.
+        columns (list, optional): Columns to read (the Datetime index is always restored).
+        time_col (str): Column the bounds apply to, 'Datetime' or 'US/Eastern Timezone'.
+
+    Returns:
+        pd.DataFrame: Matching rows, empty if the dataset isn't in the store or nothing matches.
+    """
+    years = list_partitions(root, instrument, interval)
+    # The partition year is the UTC year of the Datetime index. Keep a one day margin so a bound on
+    # another timestamp column (e.g. 1d bars stamped at 23:59 US/Eastern) can't fall in a pruned year.
+    if start is not None:
+        first_year = (pd.Timestamp(start) - pd.Timedelta(days=1)).tz_convert("UTC").year
+        years = [y for y in years if y >= first_year]
+    if end is not None:
+        last_year = (pd.Timestamp(end) + pd.Timedelta(days=1)).tz_convert("UTC").year
+        years = [y for y in years if y <= last_year]
+    if not years:
+        return pd.DataFrame()
+
+    paths = [path for y in years for path in _partition_files(partition_dir(root, instrument, interval, y))]
+    # Arrow only compares timestamps in the same zone, so express the bounds in time_col's zone
+    col_tz = pq.read_schema(paths[0]).field(time_col).type.tz
+    filters = [(time_col, op, pd.Timestamp(ts).tz_convert(col_tz))
+               for op, ts in ((">=", start), ("<=", end)) if ts is not None]
+    data = _read_files(paths, columns=columns, filters=filters or None)
+
+    if len(paths) > len(years):
+        # Segments present: a later file overrides an earlier one for the same bar
+        data = data[~data.index.duplicated(keep="last")].sort_index(kind="stable")
+    return data
+
+
+def export_ohlc_file(root, instrument, interval, folder):
+    """
+    Rewrite the monolithic Intraday_data_<instrument>_<interval>_<start>_to_<end>.parquet in folder
+    (the file the other readers use) from the store, replacing the previous one.
+    """
+    data = read_ohlc(root, instrument, interval)
+    if data.empty:
+        return None
+    start, end = str(data.index[0])[:10], str(data.index[-1])[:10]
+    path = os.path.join(folder, f"Intraday_data_{instrument}_{interval}_{start}_to_{end}.parquet")
+    previous = find_dataset(folder, instrument, interval, "raw")
+    _write_atomic(data, path)
+    if previous is not None and os.path.normpath(previous.path) != os.path.normpath(path):
+        _remove_files([previous.path])
+    return path
+
+
+def compact_ohlc_partitions(root, instrument, interval, min_segments=COMPACT_SEGMENTS, export_folder=None):
+    """
+    Merge the appended segments back into part-0 for every year holding at least min_segments of them.
+
+    Only the segments listed before a year is read are removed, so appends landing while compaction
+    runs are kept. If export_folder is given, the monolithic parquet there is refreshed afterwards.
+
+    Returns:
+        list: Years compacted.
+    """
+    compacted = []
+    for year in list_partitions(root, instrument, interval):
+        year_dir = partition_dir(root, instrument, interval, year)
+        segments = _segment_files(year_dir)
+        if not segments or len(segments) < min_segments:
+            continue
+        part = os.path.join(year_dir, PART_FILE_NAME)
+        data = _read_files(([part] if os.path.exists(part) else []) + segments)
+        data = data[~data.index.duplicated(keep="last")].sort_index(kind="stable")
+        _write_atomic(data, part)
+        _remove_files(segments)
+        compacted.append(year)
+
+    if compacted and export_folder is not None:
+        export_ohlc_file(root, instrument, interval, export_folder)
+    return compacted
+
+
+def compact_in_background(root, instrument, interval, min_segments=COMPACT_SEGMENTS, export_folder=None):
+    """Run compact_ohlc_partitions on a worker thread. Returns the started thread (join it before exiting)."""
+    thread = threading.Thread(
+        target=compact_ohlc_partitions,
+        args=(root, instrument, interval, min_segments, export_folder),
+        name=f"compact-{instrument}-{interval}",
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,73 @@
+"""
+Schema of the processed <ticker>_<interval>_events_tagged_target_tz[_nonevents].parquet files.
+Casts the event-tagged frames to compact dtypes before they are written:
+flags as uint8, sessions and event names as dictionary-encoded categoricals,
+event values and prices as float64, with real nulls instead of "na" fill values.
+"""
+
+import pandas as pd
+
+# Fill values used by tag_events / reindex for missing cells
+MISSING_MARKERS = ["na"]
+
+CATEGORY_COLUMNS = ["session", "events"]
+FLOAT_COLUMNS = ["actual", "consensus", "previous", "forecast", "Adj Close", "Close", "High", "Low", "Open", "Volume"]
+# Flags and tiers are null on the price rows without an event, so they use the nullable integer types
+FLAG_PREFIX = "IND_"
+PROCESSED_DTYPES = {
+    "year": "UInt16",
+    "tier": "UInt8",
+    "IND_NE_remove": "uint8",
+    **{col: "category" for col in CATEGORY_COLUMNS},
+    **{col: "float64" for col in FLOAT_COLUMNS},
+}
+
+
+def processed_dtype(column):
+    """Target dtype of a processed column, or None to keep it as is (timestamp columns, unknown columns)."""
+    if column in PROCESSED_DTYPES:
+        return PROCESSED_DTYPES[column]
+    if column.startswith(FLAG_PREFIX):
+        return "UInt8"
+    return None
+
+
+def compact_processed_frame(df):
+    """
+    Copy of an event-tagged frame cast to the processed schema.
+
+    Raises:
+        ValueError: A column can't be represented by its schema dtype (e.g. text in a price column).
+    """
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object:
+            series = series.mask(series.isin(MISSING_MARKERS))
+        dtype = processed_dtype(col)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # Timestamps are kept as written (the 1d files hold 'Adj Close' as the bar date)
+            dtype = None
+        try:
+            if dtype == "category":
+                series = series.astype("category")
+            elif dtype is not None:
+                if series.dtype == object:
+                    series = pd.to_numeric(series)
+                series = series.astype(dtype)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Column {col!r} doesn't fit the processed schema ({dtype}): {e}") from e
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+def write_processed_parquet(df, path):
+    """
+    Write an event-tagged frame to path with the processed schema.
+
+    Returns:
+        pd.DataFrame: The compacted frame that was written.
+    """
+    compact = compact_processed_frame(df)
+    compact.to_parquet(path, engine="pyarrow", index=False)
+    return compact
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from typing import Optional, Tuple, List, Dict
+from models.event_index import event_name_mask
 
 def record_uptrend(price_data: pd.DataFrame,
                    moves_list: List[Dict],
@@ -87,8 +88,7 @@ def detect_moves(event_df: pd.DataFrame,
       - event_df has columns ['timestamp','events'].
       - price_data has columns ['timestamp','Open','High','Low','Close'] and is sorted ascending by timestamp.
     """
-    cleaned_selected_event = selected_event.replace(" " ,"").lower().strip()
-    df = event_df[event_df['cleaned_events'].astype(str).str.startswith(cleaned_selected_event)]
+    df = event_df[event_name_mask(event_df['cleaned_events'], [selected_event])]
     initial_moves_list: List[Dict] = []
     pullback_moves_list: List[Dict] = []
 
@@ -7,6 +7,7 @@ Plotting methods moved to views/returns_plotter.py.
 import os
 import pandas as pd
 from datetime import datetime
+from models.session_utils import get_session, label_sessions
 
 
 class ReturnsCalculator:
@@ -35,20 +36,7 @@ class ReturnsCalculator:
         os.makedirs(self.output_folder, exist_ok=True)
 
     def get_session(self, timestamp):
-        hour = timestamp.hour
-        # minute = timestamp.minute
-        if 18 <= hour < 24:
-            return "Asia 18-24 ET"
-        elif 0 <= hour < 7:  # or (hour == 6 and minute < 30):
-            return "London 0-7 ET"
-        elif 7 <= hour < 10:  # or (hour == 6 and minute >= 30):
-            return "US Open 7-10 ET"
-        elif 10 <= hour < 15:
-            return "US Mid 10-15 ET"
-        elif 15 <= hour < 17:
-            return "US Close 15-17 ET"
-        else:
-            return "Other"
+        return get_session(timestamp)
 
 
     def filter_date(
@@ -62,7 +50,7 @@ class ReturnsCalculator:
         self.month_day_filter=month_day_filter
         df = filter_df.copy()
         if to_sessions == True:
-            df["session"] = df["timestamp"].apply(self.get_session)
+            df["session"] = label_sessions(df["timestamp"])
 
         if month_day_filter == []:
             if start_date == end_date == "":
@@ -118,7 +106,7 @@ class ReturnsCalculator:
         
         if columns=='NA':
             returns = (
-                df.groupby([df[target_column].dt.date, "session"], group_keys=False)
+                df.groupby([df[target_column].dt.date, "session"], group_keys=False, observed=True)
                 .apply(self._calculate_return_bps, bps_factor=bps_factor,include_groups=False)
                 .reset_index()
             )
@@ -149,7 +137,7 @@ class ReturnsCalculator:
 
     def get_daily_session_volatility_returns(self, df,bps_factor , target_col = 'timestamp'):
         
-        session_volatility_df = df.groupby([df[target_col].dt.date, "session"]).agg(
+        session_volatility_df = df.groupby([df[target_col].dt.date, "session"], observed=True).agg(
             {"High": ["max"], "Low": ["min"]}
         )
         session_volatility_df["return"] = bps_factor * (
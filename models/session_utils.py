@@ -3,21 +3,75 @@ Session utility functions for DistroDashboard.
 Functions moved here from core/utils.py.
 """
 
-#2.2 used to add the sessions column in case all data is considered.
-def get_session(timestamp):
-    hour = timestamp.hour
-    # minute = timestamp.minute
-    if 18 <= hour < 24:
-        return "Asia 18-24 ET"
-    elif 0 <= hour < 7:  # or (hour == 6 and minute < 30):
-        return "London 0-7 ET"
-    elif 7 <= hour < 10:  # or (hour == 6 and minute >= 30):
-        return "US Open 7-10 ET"
-    elif 10 <= hour < 15:
-        return "US Mid 10-15 ET"
-    elif 15 <= hour < 17:
-        return "US Close 15-17 ET"
+import numpy as np
+import pandas as pd
+
+# (start hour, end hour, label) in ET, end exclusive. Hours not covered are labelled OTHER_SESSION.
+SESSION_BOUNDARIES = [
+    (18, 24, "Asia 18-24 ET"),
+    (0, 7, "London 0-7 ET"),    # or (hour == 6 and minute < 30)
+    (7, 10, "US Open 7-10 ET"),  # or (hour == 6 and minute >= 30)
+    (10, 15, "US Mid 10-15 ET"),
+    (15, 17, "US Close 15-17 ET"),
+]
+OTHER_SESSION = "Other"
+
+
+def session_lookup(boundaries=SESSION_BOUNDARIES):
+    """
+    24-entry hour -> category code table for the given session boundaries.
+
+    Categories are sorted by name, so sorting or grouping a labelled column orders sessions exactly as
+    the plain string labels did. Earlier boundaries win where two overlap.
+
+    Returns:
+        tuple: (np.ndarray of int8 codes indexed by hour, list of category names)
+    """
+    categories = sorted({label for _, _, label in boundaries} | {OTHER_SESSION})
+    code_of = {label: code for code, label in enumerate(categories)}
+    lookup = np.full(24, code_of[OTHER_SESSION], dtype=np.int8)
+    for start, end, label in reversed(boundaries):
+        lookup[start:end] = code_of[label]
+    return lookup, categories
+
+
+_DEFAULT_LOOKUP, _DEFAULT_CATEGORIES = session_lookup()
+
+
+def label_sessions(timestamps, boundaries=None):
+    """
+    Vectorized session labels for a column of timestamps (ET).
+
+    Maps dt.hour through the 24-entry lookup table into a Categorical (1 byte per row).
+    Missing timestamps are labelled "Other", like get_session.
+
+    Args:
+        timestamps (pd.Series | pd.DatetimeIndex): Timestamps in ET.
+        boundaries (list, optional): (start hour, end hour, label) tuples, default SESSION_BOUNDARIES.
+
+    Returns:
+        pd.Series: Categorical session labels, with the index of timestamps when it is a Series.
+    """
+    lookup, categories = (_DEFAULT_LOOKUP, _DEFAULT_CATEGORIES) if boundaries is None else session_lookup(boundaries)
+    series = timestamps if isinstance(timestamps, pd.Series) else pd.Series(timestamps)
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        hours = series.dt.hour.to_numpy(dtype=np.float64, na_value=np.nan)
     else:
-        return "Other"
+        # object column (e.g. mixed UTC offsets): read the hour of each timestamp
+        hours = np.array([getattr(ts, "hour", np.nan) for ts in series], dtype=np.float64)
+
+    codes = np.full(len(hours), categories.index(OTHER_SESSION), dtype=np.int8)
+    valid = ~np.isnan(hours)
+    codes[valid] = lookup[hours[valid].astype(np.intp)]
+    labels = pd.Categorical.from_codes(codes, categories=categories)
+    return pd.Series(labels, index=series.index, name="session")
 
 
+#2.2 used to add the sessions column in case all data is considered.
+def get_session(timestamp):
+    """Session label of a single timestamp (ET). Use label_sessions for a whole column."""
+    hour = timestamp.hour
+    if pd.isna(hour):
+        return OTHER_SESSION
+    return _DEFAULT_CATEGORIES[_DEFAULT_LOOKUP[hour]]
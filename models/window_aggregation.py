@@ -0,0 +1,97 @@
+"""
+Window aggregation kernel for DistroDashboard.
+Computes open/high/low/close over many [start, end) windows of a sorted OHLC frame in one pass.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _to_ns(values):
+    # datetime-like (naive or tz-aware) -> int64 nanoseconds since epoch (UTC for tz-aware), NaT -> int64 min
+    return pd.Series(values).to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def window_bounds(timestamps, starts, ends):
+    """
+    Row bounds [lo, hi) of every window start <= ts < end on a sorted timestamp array.
+
+    Windows with a NaT start or end are returned empty (lo == hi).
+    """
+    ts = _to_ns(timestamps)
+    start_ns = _to_ns(starts)
+    end_ns = _to_ns(ends)
+
+    lo = np.searchsorted(ts, start_ns, side='left')
+    hi = np.searchsorted(ts, end_ns, side='left')
+
+    nat = np.iinfo(np.int64).min
+    invalid = (start_ns == nat) | (end_ns == nat) | (hi < lo)
+    hi = np.where(invalid, lo, hi)
+    return lo, hi
+
+
+def aggregate_ohlc_windows(ohlc, starts, ends, time_col='US/Eastern Timezone'):
+    """
+    Aggregates OHLC bars over [start, end) windows.
+
+    Bounds are located with np.searchsorted and the high/low of every window is reduced with
+    np.fmax.reduceat / np.fmin.reduceat (NaN-skipping, like pandas max/min), so the cost is
+    O((N + W) log N) instead of one boolean filter of the whole frame per window.
+
+    Args:
+        ohlc (pd.DataFrame): Price data with columns [time_col, 'Open', 'High', 'Low', 'Close'].
+            Sorted by time_col; it is sorted here if it is not.
+        starts (array-like): Window start timestamps (inclusive).
+        ends (array-like): Window end timestamps (exclusive).
+        time_col (str): Timestamp column of ohlc.
+
+    Returns:
+        pd.DataFrame: One row per window with columns
+            ['Start_Date', 'End_Date', 'Entry_Price', 'Exit_Price', 'High', 'Low'].
+            Start_Date/End_Date are the first/last bar timestamps in the window.
+            Empty windows are all NaN/NaT.
+    """
+    if not ohlc[time_col].is_monotonic_increasing:
+        ohlc = ohlc.sort_values(time_col, kind='stable')
+
+    lo, hi = window_bounds(ohlc[time_col], starts, ends)
+    n_windows = len(lo)
+    nonempty = np.flatnonzero(hi > lo)
+
+    opens = ohlc['Open'].to_numpy(dtype=float)
+    closes = ohlc['Close'].to_numpy(dtype=float)
+    highs = ohlc['High'].to_numpy(dtype=float)
+    lows = ohlc['Low'].to_numpy(dtype=float)
+
+    entry = np.full(n_windows, np.nan)
+    exit_ = np.full(n_windows, np.nan)
+    high = np.full(n_windows, np.nan)
+    low = np.full(n_windows, np.nan)
+
+    if len(nonempty):
+        w_lo = lo[nonempty]
+        w_hi = hi[nonempty]
+        entry[nonempty] = opens[w_lo]
+        exit_[nonempty] = closes[w_hi - 1]
+
+        # reduceat reduces a[idx[i]:idx[i+1]], so interleave (lo, hi) pairs and keep the even slots.
+        # A trailing sentinel keeps hi == N a valid index; overlapping windows are fine this way.
+        idx = np.empty(2 * len(nonempty), dtype=np.intp)
+        idx[0::2] = w_lo
+        idx[1::2] = w_hi
+        high[nonempty] = np.fmax.reduceat(np.append(highs, np.nan), idx)[0::2]
+        low[nonempty] = np.fmin.reduceat(np.append(lows, np.nan), idx)[0::2]
+
+    times = ohlc[time_col].reset_index(drop=True)
+    first_ts = times.reindex(np.where(hi > lo, lo, -1)).reset_index(drop=True)
+    last_ts = times.reindex(np.where(hi > lo, hi - 1, -1)).reset_index(drop=True)
+
+    return pd.DataFrame({
+        'Start_Date': first_ts,
+        'End_Date': last_ts,
+        'Entry_Price': entry,
+        'Exit_Price': exit_,
+        'High': high,
+        'Low': low,
+    })
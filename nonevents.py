@@ -1,5 +1,55 @@
 import pandas as pd
 import numpy as np
+
+
+def flag_time_windows(timestamps, event_mask, time_window):
+    """
+    Flags every bar whose timestamp lies within [t - time_window, t + time_window] of any event timestamp t.
+
+    The event windows are merged into disjoint intervals from the sorted event timestamps, and the covered
+    bars are marked with searchsorted + a difference-array cumsum, i.e. O(N log E) instead of O(N x E).
+    NaT bars are never flagged and NaT events never flag anything.
+
+    Args:
+        timestamps (pd.Series): Bar timestamps (naive or tz-aware, need not be sorted).
+        event_mask (array-like of bool): True for rows that are events.
+        time_window (pd.Timedelta): Half width of the window around each event.
+
+    Returns:
+        np.ndarray: int array (0/1), aligned with timestamps.
+    """
+    ts = pd.Series(timestamps).to_numpy(dtype='datetime64[ns]').view('int64')
+    valid = ts != np.iinfo(np.int64).min    # NaT is stored as int64 min
+    event_mask = np.asarray(event_mask, dtype=bool) & valid
+
+    flags = np.zeros(len(ts), dtype=int)
+    if not event_mask.any():
+        return flags
+
+    # Merge overlapping [t-w, t+w] windows. All windows have the same width, so a new interval
+    # starts wherever the gap to the previous event is larger than 2w.
+    w = pd.Timedelta(time_window).value
+    event_ts = np.sort(ts[event_mask])
+    new_interval = np.empty(len(event_ts), dtype=bool)
+    new_interval[0] = True
+    new_interval[1:] = np.diff(event_ts) > 2 * w
+    starts = event_ts[new_interval] - w
+    ends = event_ts[np.append(new_interval[1:], True)] + w
+
+    # Mark covered bars on the sorted timestamps, then scatter back to the original order
+    valid_pos = np.flatnonzero(valid)
+    order = valid_pos[np.argsort(ts[valid_pos], kind='stable')]
+    sorted_ts = ts[order]
+    lo = np.searchsorted(sorted_ts, starts, side='left')
+    hi = np.searchsorted(sorted_ts, ends, side='right')
+
+    diff = np.zeros(len(sorted_ts) + 1, dtype=np.int64)
+    np.add.at(diff, lo, 1)
+    np.add.at(diff, hi, -1)
+    flags[order] = (np.cumsum(diff[:-1]) > 0).astype(int)
+    return flags
+
+
 class Nonevents:
     """
     Filters the data based on events and non events
@@ -19,14 +69,7 @@ class Nonevents:
 
         # Handle time windows for IND_Tier2, IND_Tier3, and IND_FED
         def flag_time_window(tier_col, time_window):
-            flags = np.zeros(len(df), dtype=int)
-            for _, row in df.iterrows():
-                if row[tier_col] == 1:
-                    start_time = row['timestamp'] - time_window
-                    end_time = row['timestamp'] + time_window
-                    within_window = (df['timestamp'] >= start_time) & (df['timestamp'] <= end_time)
-                    flags |= (within_window).values #bit-wise or
-            return flags
+            return flag_time_windows(df['timestamp'], (df[tier_col] == 1).to_numpy(), time_window)
 
         # Apply time-based flagging
         df['ind_tier2'] = flag_time_window('IND_Tier2', pd.Timedelta(minutes=30))
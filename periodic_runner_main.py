@@ -1,11 +1,15 @@
 ### Step 1: Import Required Libraries and Define Functions
 import os
 import shutil #deleting directories
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import pandas as pd
 from intradaydata import Intraday
 from intradaydata_investing import Intraday_Investing
 from preprocessing import ManipulateTimezone
 from tzlocal import get_localzone  # Automatically detects system timezone
+from models.catalog import find_dataset
+from price_sources import SyntheticSource
 
 def _add_target_tz_col(intraday_csv,current_tz='UTC',final_tz='US/Eastern',tickerinterval=''):
     
@@ -27,6 +31,110 @@ def _add_target_tz_col(intraday_csv,current_tz='UTC',final_tz='US/Eastern',ticke
                                                             target_tz=final_tz)
     return intraday_target_tz_csv
 
+def _fetch_data(IntradayObject,
+                mysymboldict,
+                website='yahoo finance'
+               ):
+    """Network step of _save_data: returns ({ticker: new data}, timezone of the fetched timestamps)."""
+    if website=='yahoo finance':
+        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers) #Get dictionary of specific intraday data that we want to store
+        fetched_tz='UTC'
+    elif website=='investing':
+        alldatadict={list(mysymboldict.values())[0][0]:IntradayObject.fetch_data_investing()}
+        fetched_tz=get_localzone()
+    return alldatadict, fetched_tz
+
+
+def _merge_symbol(Intraday_data_files,
+                  Daily_backup_files,
+                  return_interval,
+                  symbol,
+                  newcsv,
+                  fetched_tz,
+                  temp_folder='temp'
+                 ):
+    """CPU step of _save_data for one symbol: merge the new data with the old file and write it into temp_folder."""
+    newcsv.drop_duplicates(inplace=True)
+    newcsv.dropna(inplace=True)
+    if (newcsv.index.to_list())!=[]:
+        newstart=str(newcsv.index.to_list()[0])[:10]
+        newend=str(newcsv.index.to_list()[-1])[:10]
+        start_end_date=f'Intraday_{symbol}_{newstart}_to_{newend}.csv'
+        # Save the new data file into "Daily_backup_files" folder. Written to a temp file first: cases of the
+        # same symbol share this file name and may be merged at the same time.
+        backup_path=os.path.join(Daily_backup_files,start_end_date)
+        newcsv.to_csv(f'{backup_path}.{os.getpid()}.tmp')
+        os.replace(f'{backup_path}.{os.getpid()}.tmp',backup_path)
+        print(f'New data fetched for {symbol}: {start_end_date}')
+        print(newcsv)
+
+        if 'Adj Close' not in newcsv.columns:
+            newcsv['Adj Close']=newcsv['Close']
+            # Define the desired column order
+            required_columns = ['Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+            
+            # Reindex to reorder and fill missing columns with NaN
+            newcsv = newcsv.reindex(columns=required_columns)
+
+    else:
+        print(f'No new data fetched for {symbol}')
+        newcsv=pd.DataFrame()
+
+
+    flag=0
+    entry = find_dataset(Intraday_data_files, symbol, return_interval, 'raw', file_type='.csv')
+    if entry is not None:
+        oldcsv=pd.read_csv(entry.path)
+        if 'Datetime' in list(oldcsv.columns):#index is in 0...... and not Datetime format->cause error in merging
+            oldcsv.index.name='Datetime'
+            oldcsv.columns.name='Price'
+            oldcsv.index=oldcsv['Datetime']
+            oldcsv.drop(columns=['Datetime'],axis=1,inplace=True)
+        flag=1
+    if flag==0:
+        oldcsv=pd.DataFrame()
+        print(f'Historical data for {symbol} not found.')
+
+    if newcsv.empty and oldcsv.empty:
+        print(f"No data available for {symbol}. Both old and new data are empty.")
+        finalcsv = pd.DataFrame()  # Create an empty DataFrame
+    
+    elif newcsv.empty:
+        print(f"No new data fetched for {symbol}. Using only historical data.")
+        finalcsv = oldcsv.copy()  # Use only the historical data
+
+    elif oldcsv.empty:
+        print(f"No historical data found for {symbol}. Using only new data.")
+        finalcsv = newcsv.copy()  # Use only the new data
+
+    else:
+        finalcsv = pd.concat([oldcsv,newcsv])
+    print(finalcsv)
+    finalcsv.drop_duplicates(inplace=True)
+    finalcsv.dropna(inplace=True,how='all') 
+    finalcsv.index = pd.to_datetime(finalcsv.index)
+    finalcsv.sort_index(inplace=True)
+    finalcsv.drop_duplicates(inplace=True)
+    finalcsv.dropna(inplace=True,how='all') 
+    finalcsv = finalcsv.loc[~finalcsv.index.duplicated(keep='last')]
+
+
+    finalstart=str(finalcsv.index.to_list()[0])[:10]
+    finalend=str(finalcsv.index.to_list()[-1])[:10]
+    finalpath=os.path.join(temp_folder,f'Intraday_data_{symbol}_{return_interval}_{finalstart}_to_{finalend}.csv')
+    finalcsv=_add_target_tz_col(finalcsv,current_tz=fetched_tz,final_tz='US/Eastern',tickerinterval=return_interval)
+    finalcsv.to_csv(finalpath,index=True)
+    # #print(f'Old CSV for {symbol}')
+    # #print(f'New CSV for {symbol}')
+    # print(f'Combined CSV for {symbol}')
+    print(finalcsv)
+
+    # stored_csv_path_stats=finalpath.replace('.csv','_stats.csv')
+    # final_stats_csv=_store_descriptive_stats(finalcsv,'Adj Close')
+    # final_stats_csv.name=f'(Interval:{return_interval}, Symbol:{symbol})'
+    # final_stats_csv.to_csv(stored_csv_path_stats)
+
+
 def _save_data(Intraday_data_files,
               Daily_backup_files,
               return_interval, 
@@ -35,134 +143,75 @@ def _save_data(Intraday_data_files,
               website='yahoo finance'
              ):
     
-    if website=='yahoo finance':
-        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers) #Get dictionary of specific intraday data that we want to store
-        fetched_tz='UTC'
-    elif website=='investing':
-        alldatadict={list(mysymboldict.values())[0][0]:IntradayObject.fetch_data_investing()}
-        fetched_tz=get_localzone()
+    alldatadict,fetched_tz=_fetch_data(IntradayObject,mysymboldict,website)
 
     #print(start_date,end_date)
     #print(alldatadict)
     ## In the "temp" folder, merge the new data with old data (old data is present in "Intraday_data_files")
     for key in alldatadict.keys():
-        symbol=mysymboldict[key][0]
-        newcsv=alldatadict[key]
-        newcsv.drop_duplicates(inplace=True)
-        newcsv.dropna(inplace=True)
-        if (newcsv.index.to_list())!=[]:
-            newstart=str(newcsv.index.to_list()[0])[:10]
-            newend=str(newcsv.index.to_list()[-1])[:10]
-            start_end_date=f'Intraday_{symbol}_{newstart}_to_{newend}.csv'
-            alldatadict[key].to_csv(os.path.join(Daily_backup_files,start_end_date))# Save the new data file into "Daily_backup_files" folder
-            print(f'New data fetched for {symbol}: {start_end_date}')
-            print(alldatadict[key])
-
-            if 'Adj Close' not in newcsv.columns:
-                newcsv['Adj Close']=newcsv['Close']
-                # Define the desired column order
-                required_columns = ['Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume']
-                
-                # Reindex to reorder and fill missing columns with NaN
-                newcsv = newcsv.reindex(columns=required_columns)
-
-        else:
-            print(f'No new data fetched for {symbol}')
-            newcsv=pd.DataFrame()
-
-    
-        flag=0
-        for entry2 in os.scandir(Intraday_data_files):
-            if entry2.is_file() and entry2.name.endswith('.csv') and 'stats' not in entry2.name:
-               
-                [_,_,ticker,interval,oldstart,_,oldend]=(entry2.name.replace('.csv',"")).split('_')
-                if ticker==symbol and interval==return_interval:
-                    oldcsvpath=os.path.join(Intraday_data_files,entry2.name)
-                    oldcsv=pd.read_csv(oldcsvpath)
-                    if 'Datetime' in list(oldcsv.columns):#index is in 0...... and not Datetime format->cause error in merging
-                        oldcsv.index.name='Datetime'
-                        oldcsv.columns.name='Price'
-                        oldcsv.index=oldcsv['Datetime']
-                        oldcsv.drop(columns=['Datetime'],axis=1,inplace=True)
-                    flag=1
-                    break
-                else:
-                    continue
-        if flag==0:
-            oldcsv=pd.DataFrame()
-            print(f'Historical data for {symbol} not found.')
-    
-        if newcsv.empty and oldcsv.empty:
-            print(f"No data available for {symbol}. Both old and new data are empty.")
-            finalcsv = pd.DataFrame()  # Create an empty DataFrame
-        
-        elif newcsv.empty:
-            print(f"No new data fetched for {symbol}. Using only historical data.")
-            finalcsv = oldcsv.copy()  # Use only the historical data
-    
-        elif oldcsv.empty:
-            print(f"No historical data found for {symbol}. Using only new data.")
-            finalcsv = newcsv.copy()  # Use only the new data
-    
-        else:
-            finalcsv = pd.concat([oldcsv,newcsv])
-        print(finalcsv)
-        finalcsv.drop_duplicates(inplace=True)
-        finalcsv.dropna(inplace=True,how='all') 
-        finalcsv.index = pd.to_datetime(finalcsv.index)
-        finalcsv.sort_index(inplace=True)
-        finalcsv.drop_duplicates(inplace=True)
-        finalcsv.dropna(inplace=True,how='all') 
-        finalcsv = finalcsv.loc[~finalcsv.index.duplicated(keep='last')]
-
-
-        finalstart=str(finalcsv.index.to_list()[0])[:10]
-        finalend=str(finalcsv.index.to_list()[-1])[:10]
-        finalpath=os.path.join('temp',f'Intraday_data_{symbol}_{return_interval}_{finalstart}_to_{finalend}.csv')
-        finalcsv=_add_target_tz_col(finalcsv,current_tz=fetched_tz,final_tz='US/Eastern',tickerinterval=return_interval)
-        finalcsv.to_csv(finalpath,index=True)
-        # #print(f'Old CSV for {symbol}')
-        # #print(f'New CSV for {symbol}')
-        # print(f'Combined CSV for {symbol}')
-        print(finalcsv)
-
-        # stored_csv_path_stats=finalpath.replace('.csv','_stats.csv')
-        # final_stats_csv=_store_descriptive_stats(finalcsv,'Adj Close')
-        # final_stats_csv.name=f'(Interval:{return_interval}, Symbol:{symbol})'
-        # final_stats_csv.to_csv(stored_csv_path_stats)
+        _merge_symbol(Intraday_data_files,
+                      Daily_backup_files,
+                      return_interval,
+                      symbol=mysymboldict[key][0],
+                      newcsv=alldatadict[key],
+                      fetched_tz=fetched_tz)
         
    
+def _case_symbols(dic='default',mywebsite='yahoo finance'):
+    """{ticker: [symbol, name, (url)]} for a runner case."""
+    if dic!='default':
+        return dic
+    if mywebsite=='yahoo finance':
+        return {
+        "ZN=F":["ZN","10-Year T-Note Futures"],
+        "ZB=F":["ZB","30-Year T-Bond Futures"],
+        "ZF=F":["ZF","5-Year US T-Note Futures"],
+        "ZT=F":["ZT","2-Year US T-Note Futures"],
+        "DX-Y.NYB":["DXY","US Dollar Index"],
+        "CL=F":["CL","Crude Oil futures"],
+        "GC=F":["GC","Gold futures"],
+        "NQ=F":["NQ","Nasdaq 100 futures"],
+        "^DJI":["DJI","Dow Jones Industrial Average"],
+        "^GSPC":["GSPC","S&P 500"]
+        }
+    elif mywebsite=='investing':
+        return {
+            "FGBL":["FGBL","German 10 YR Bund Futures",
+            'https://in.investing.com/rates-bonds/euro-bund-historical-data']
+        }
+
+
+def _build_intraday_object(start,end,ticker_interval,dic='default',mywebsite='yahoo finance',source=None):
+    """(IntradayObject, mysymboldict) used to fetch a runner case. source: price_sources.PriceSource (default: live)."""
+    mysymboldict=_case_symbols(dic,mywebsite)
+    if mywebsite=='yahoo finance':
+        my_intraday_obj=Intraday(start_intraday=start,
+                                end_intraday=end,
+                                interval=ticker_interval,
+                                source=source)
+        my_intraday_obj.update_dict_symbols(mysymboldict)
+
+    elif mywebsite=='investing':
+        print(len(list(mysymboldict)))
+        my_intraday_obj=Intraday_Investing(url=list(mysymboldict.values())[0][2],
+                                           interval=ticker_interval,
+                                           source=source,
+                                           symbol=list(mysymboldict.values())[0][0])
+    return my_intraday_obj, mysymboldict
+
+
 def runner(start,
            end,
            ticker_interval,
            Intraday_data_files,
            Daily_backup_files,
            dic='default',
-           mywebsite='yahoo finance'
+           mywebsite='yahoo finance',
+           source=None
           ):
-    if mywebsite=='yahoo finance':
-        my_intraday_obj=Intraday(start_intraday=start,
-                                end_intraday=end,
-                                interval=ticker_interval)
-        if dic=='default':
-            mysymboldict={
-            "ZN=F":["ZN","10-Year T-Note Futures"],
-            "ZB=F":["ZB","30-Year T-Bond Futures"],
-            "ZF=F":["ZF","5-Year US T-Note Futures"],
-            "ZT=F":["ZT","2-Year US T-Note Futures"],
-            "DX-Y.NYB":["DXY","US Dollar Index"],
-            "CL=F":["CL","Crude Oil futures"],
-            "GC=F":["GC","Gold futures"],
-            "NQ=F":["NQ","Nasdaq 100 futures"],
-            "^DJI":["DJI","Dow Jones Industrial Average"],
-            "^GSPC":["GSPC","S&P 500"]
-            }
-        else:
-            mysymboldict=dic
-
-        my_intraday_obj.update_dict_symbols(mysymboldict)
+    my_intraday_obj,mysymboldict=_build_intraday_object(start,end,ticker_interval,dic,mywebsite,source)
 
-        _save_data(Intraday_data_files,
+    _save_data(Intraday_data_files,
         Daily_backup_files,
         return_interval=ticker_interval,
         IntradayObject=my_intraday_obj,
@@ -170,29 +219,117 @@ def runner(start,
         website=mywebsite
         )
 
-    elif mywebsite=='investing':
-        if dic=='default':
-            mysymboldict={
-                "FGBL":["FGBL","German 10 YR Bund Futures",
-                'https://in.investing.com/rates-bonds/euro-bund-historical-data']
-            }
-        else:
-            mysymboldict=dic
 
-        print(len(list(mysymboldict)))
-        my_intraday_obj=Intraday_Investing(url=list(mysymboldict.values())[0][2],
-                                           interval=ticker_interval)
-        
-        _save_data(Intraday_data_files,
-            Daily_backup_files,
-            return_interval=ticker_interval,
-            IntradayObject=my_intraday_obj,
-            mysymboldict=mysymboldict,
-            website=mywebsite
-            )
-        
-   
+# =============================================================================
+# Concurrent runner
+# =============================================================================
+
+# Cases fetched on every run (keyword arguments of runner without the folders)
+RUNNER_CASES = [
+    # Case:1: 1m frequency available for all instruments.
+    dict(start=-1, end=-1, ticker_interval='1m', dic='default'),
+    # Case:2
+    dict(start=710, end=-10, ticker_interval='1h', dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
+    # Case:3
+    dict(start=15, end=-3, ticker_interval='15m', dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
+    # Case:4
+    dict(start=-1, end=-1, ticker_interval='1d', dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
+    # Case:5: FGBL from investing.com
+    dict(start=None, end=None, ticker_interval='1d', mywebsite='investing',
+         dic={"FGBL":["FGBL","German 10 YR Bund Futures",'https://in.investing.com/rates-bonds/euro-bund-historical-data']}),
+]
+
+
+def fetch_case(case,source=None):
+    """
+    Fetch one runner case from yahoo finance / investing.com, or from source (price_sources.PriceSource) if given.
+
+    Returns:
+        tuple: ({symbol: new data}, timezone of the fetched timestamps)
+    """
+    mywebsite=case.get('mywebsite','yahoo finance')
+    my_intraday_obj,mysymboldict=_build_intraday_object(case['start'],case['end'],case['ticker_interval'],
+                                                        case.get('dic','default'),mywebsite,source)
+    alldatadict,fetched_tz=_fetch_data(my_intraday_obj,mysymboldict,mywebsite)
+    return {mysymboldict[key][0]:data for key,data in alldatadict.items()}, fetched_tz
+
+
+def stub_fetcher(case, n_bars=500, seed=0):
+    """
+    Offline stand-in for fetch_case: price_sources.SyntheticSource bars (a random walk per symbol, ending at
+    the current bar). Deterministic for a given symbol, interval and seed.
+    """
+    return fetch_case(case, source=SyntheticSource(n_bars=n_bars, seed=seed))
+
+
+def _swap_directory(temp_folder,target_folder):
+    """Replace target_folder by temp_folder. The old folder is only deleted once the new one is in place."""
+    backup_folder=target_folder+'_old'
+    if os.path.exists(backup_folder):
+        shutil.rmtree(backup_folder)
+    if os.path.exists(target_folder):
+        os.rename(target_folder,backup_folder)
+    try:
+        os.rename(temp_folder,target_folder)
+    except Exception:
+        if os.path.exists(backup_folder):
+            os.rename(backup_folder,target_folder)  # put the old data back
+        raise
+    if os.path.exists(backup_folder):
+        shutil.rmtree(backup_folder)
+    print(f"Directory renamed from '{temp_folder}' to '{target_folder}'")
+
+
+def concurrent_runner(cases,
+                      Intraday_data_files,
+                      Daily_backup_files,
+                      fetcher=fetch_case,
+                      max_fetch_workers=4,
+                      max_merge_workers=None,
+                      temp_folder='temp'
+                     ):
+    """
+    Run all cases concurrently: network fetches on a bounded thread pool, merge + write of each
+    (symbol, interval) on a process pool as soon as its case is fetched.
+
+    The merged files go to temp_folder, which replaces Intraday_data_files only once every case has
+    succeeded; if anything fails the old data is left untouched and the error is raised.
+
+    Args:
+        cases (list): runner keyword arguments per case (see RUNNER_CASES).
+        fetcher (callable): case -> ({symbol: new data}, fetched_tz). stub_fetcher runs offline.
+        max_fetch_workers (int): Concurrent network fetches.
+        max_merge_workers (int, optional): Merge processes (default: CPU count).
+    """
+    if os.path.exists(temp_folder):
+        shutil.rmtree(temp_folder)  # leftovers of a failed run must not be swapped in
+    os.makedirs(temp_folder)
+
+    # spawn: the fetch threads are already running when the first worker starts
+    with ThreadPoolExecutor(max_workers=max_fetch_workers) as fetch_pool, \
+         ProcessPoolExecutor(max_workers=max_merge_workers, mp_context=multiprocessing.get_context('spawn')) as merge_pool:
+        fetches={fetch_pool.submit(fetcher,case):case for case in cases}
+        merges=[]
+        for future in as_completed(fetches):
+            case=fetches[future]
+            alldatadict,fetched_tz=future.result()
+            for symbol,newcsv in alldatadict.items():
+                merges.append(merge_pool.submit(_merge_symbol,
+                                                Intraday_data_files,
+                                                Daily_backup_files,
+                                                case['ticker_interval'],
+                                                symbol,
+                                                newcsv,
+                                                fetched_tz,
+                                                temp_folder))
+        for future in as_completed(merges):
+            future.result()
+
+    _swap_directory(temp_folder,Intraday_data_files)
+
+
 INTRADAY_FILES= "Intraday_data_files" # Read current dataset of historical data
+USE_STUB_FETCHER = False # True: run the pipeline offline on synthetic bars (local testing)
 if __name__=='__main__':
     ### Make Folders to Store Data
     os.makedirs(INTRADAY_FILES, exist_ok=True)
@@ -203,81 +340,9 @@ if __name__=='__main__':
         shutil.rmtree(DAILY_FILES)
         # Create the directory
     os.makedirs(DAILY_FILES)
-    os.makedirs('temp',exist_ok=True) # Temporary file to hold new Intraday data. Later gets renamed to "Intraday_data_files" after new and old data gets Merged
-    
-    
-    # Case:1
-    runner(start=-1,
-           end=-1,
-           ticker_interval='1m',
-           dic='default',
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-
-    
-    # Case:2
-    runner(start=710,
-           end=-10,
-           ticker_interval='1h',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-    
 
-    # Case:3
-    runner(start=15,
-           end=-3,
-           ticker_interval='15m',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-    
-
-    # Case:4
-    runner(start=-1,
-           end=-1,
-           ticker_interval='1d',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-    
-    # Case:5: FGBL from investing.com
-    runner(
-        start=None,
-        end=None,
-        ticker_interval='1d',
-        dic={"FGBL":["FGBL","German 10 YR Bund Futures",'https://in.investing.com/rates-bonds/euro-bund-historical-data']},
-        Intraday_data_files=INTRADAY_FILES,
-        Daily_backup_files=DAILY_FILES,
-        mywebsite='investing'
-    )
-
-        
-    ### Delete the "Intraday_data_files directory" and rename "temp" as "Intraday_data_files directory"
-    #Delete "Intraday_data_files directory"
-    directory_path = INTRADAY_FILES
-    try:
-        shutil.rmtree(directory_path)
-        print(f"Directory {directory_path} and its contents deleted successfully.")
-    except FileNotFoundError:
-        print("The directory does not exist.")
-    except PermissionError:
-        print("You do not have the necessary permissions to delete this directory.")
-    
-    #Rename "temp" as "Intraday_data_files directory" 
-    current_name = "temp"
-    new_name = "Intraday_data_files"
-    
-    try:
-        os.rename(current_name, new_name)
-        print(f"Directory renamed from '{current_name}' to '{new_name}'")
-    except FileNotFoundError:
-        print(f"Directory '{current_name}' not found!")
-    except PermissionError:
-        print("You do not have permission to rename this directory.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    # Fetch all cases concurrently, merge them into "temp", then swap "temp" in as "Intraday_data_files"
+    concurrent_runner(RUNNER_CASES,
+                      Intraday_data_files=INTRADAY_FILES,
+                      Daily_backup_files=DAILY_FILES,
+                      fetcher=stub_fetcher if USE_STUB_FETCHER else fetch_case)
@@ -6,6 +6,12 @@ from intradaydata import Intraday
 from intradaydata_investing_github_actions import Intraday_Investing
 from preprocessing import ManipulateTimezone
 from tzlocal import get_localzone  # Automatically detects system timezone
+from models.catalog import find_dataset
+from models.ohlc_store import (OHLC_STORE_ROOT, COMPACT_SEGMENTS, list_partitions, write_ohlc_partitions,
+                               append_ohlc_segment, count_segments, compact_in_background)
+
+# Background compactions started by incremental runs; joined before the script exits
+COMPACTION_THREADS = []
 
 def _add_target_tz_col(intraday_csv,current_tz='UTC',final_tz='US/Eastern',tickerinterval=''):
     
@@ -35,13 +41,15 @@ def _save_data(#Intraday_data_files,
               return_interval, 
               IntradayObject,
               mysymboldict,
-              website='yahoo finance'
+              website='yahoo finance',
+              incremental=False
              ):
     
     #since start_intraday & end_intraday is not specified, the entire data is fetched.
     if website=='yahoo finance':
         #key = ticker, value = dataframe, with Datetime column as index.
-        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers) 
+        #incremental: only the span missing from the OHLC store (plus a few bars of overlap) is requested.
+        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers,incremental=incremental) 
         fetched_tz='UTC'
     elif website=='investing':
         alldatadict={list(mysymboldict.values())[0][0]:IntradayObject.fetch_data_investing()}
@@ -78,25 +86,33 @@ def _save_data(#Intraday_data_files,
             print(f'No new data fetched for {symbol}')
             newcsv=pd.DataFrame()
 
-    
-        flag=0
-
-        for entry2 in os.scandir(Intraday_data_files_pq):
-            if entry2.is_file() and entry2.name.endswith('.parquet') and 'stats' not in entry2.name:
-               
-                [_,_,ticker,interval,oldstart,_,oldend]=(entry2.name.replace('.parquet',"")).split('_')
-                if ticker==symbol and interval==return_interval:
-                    oldcsvpath=os.path.join(Intraday_data_files_pq,entry2.name)
-                    oldcsv=pd.read_parquet(oldcsvpath)
-                    if 'Datetime' in list(oldcsv.columns):#index is in 0...... and not Datetime format->cause error in merging
-                        oldcsv.index.name='Datetime'
-                        oldcsv.columns.name='Price'
-                        oldcsv.index=oldcsv['Datetime']
-                        oldcsv.drop(columns=['Datetime'],axis=1,inplace=True)
-                    flag=1
-                    break
+        if incremental and list_partitions(OHLC_STORE_ROOT, symbol, return_interval):
+            # Incremental ingest: append only the new bars to the OHLC store, the history isn't reloaded.
+            # Readers (returns_main, get_data, the dashboards) read the store while it is ahead of the
+            # monolithic parquet, which is only re-exported when the year partitions are compacted.
+            if not newcsv.empty:
+                if website=='yahoo finance':
+                    newcsv.index = pd.to_datetime(newcsv.index,utc=True)
                 else:
-                    continue
+                    newcsv.index = pd.to_datetime(newcsv.index)
+                newcsv=_add_target_tz_col(newcsv,current_tz=fetched_tz,final_tz='US/Eastern',tickerinterval=return_interval)
+                appended=append_ohlc_segment(newcsv, OHLC_STORE_ROOT, symbol, return_interval)
+                print(f'{appended} new/changed bars appended for {symbol}_{return_interval}')
+                if max(count_segments(OHLC_STORE_ROOT, symbol, return_interval).values()) >= COMPACT_SEGMENTS:
+                    COMPACTION_THREADS.append(compact_in_background(OHLC_STORE_ROOT, symbol, return_interval,
+                                                                    export_folder=Intraday_data_files_pq))
+            continue
+
+        flag=0
+        entry = find_dataset(Intraday_data_files_pq, symbol, return_interval, 'raw')
+        if entry is not None:
+            oldcsv=pd.read_parquet(entry.path)
+            if 'Datetime' in list(oldcsv.columns):#index is in 0...... and not Datetime format->cause error in merging
+                oldcsv.index.name='Datetime'
+                oldcsv.columns.name='Price'
+                oldcsv.index=oldcsv['Datetime']
+                oldcsv.drop(columns=['Datetime'],axis=1,inplace=True)
+            flag=1
 
         if flag==0:
             oldcsv=pd.DataFrame()
@@ -131,9 +147,18 @@ def _save_data(#Intraday_data_files,
 
         finalstart=str(finalcsv.index.to_list()[0])[:10]
         finalend=str(finalcsv.index.to_list()[-1])[:10]
-        final_path_pq = os.path.join('temp_pq',f'Intraday_data_{symbol}_{return_interval}_{finalstart}_to_{finalend}.parquet')
+        # Incremental mode has no directory swap, so the file is replaced in place
+        final_folder = Intraday_data_files_pq if incremental else 'temp_pq'
+        final_path_pq = os.path.join(final_folder,f'Intraday_data_{symbol}_{return_interval}_{finalstart}_to_{finalend}.parquet')
         finalcsv=_add_target_tz_col(finalcsv,current_tz=fetched_tz,final_tz='US/Eastern',tickerinterval=return_interval)
         finalcsv.to_parquet(final_path_pq , engine='pyarrow')
+        if incremental and entry is not None and os.path.normpath(entry.path)!=os.path.normpath(final_path_pq):
+            os.remove(entry.path)
+
+        # Year-partitioned copy in the OHLC store; only the years touched by the new data are rewritten.
+        if not newcsv.empty or not list_partitions(OHLC_STORE_ROOT, symbol, return_interval):
+            since = None if (newcsv.empty or oldcsv.empty) else newcsv.index.min()
+            write_ohlc_partitions(finalcsv, OHLC_STORE_ROOT, symbol, return_interval, since=since)
 
         
    
@@ -145,12 +170,16 @@ def runner(start,
         #    Daily_backup_files,
            Daily_backup_files_pq,
            dic='default',
-           mywebsite='yahoo finance'
+           mywebsite='yahoo finance',
+           incremental=False,
+           source=None
           ):
+    # source: price_sources.PriceSource serving the bars (default: live yahoo finance / investing.com)
     if mywebsite=='yahoo finance':
         my_intraday_obj=Intraday(start_intraday=start,
                                 end_intraday=end,
-                                interval=ticker_interval)
+                                interval=ticker_interval,
+                                source=source)
         if dic=='default':
             mysymboldict={
             "ZN=F":["ZN","10-Year T-Note Futures"],
@@ -176,7 +205,8 @@ def runner(start,
         return_interval=ticker_interval,
         IntradayObject=my_intraday_obj,
         mysymboldict=mysymboldict,
-        website=mywebsite
+        website=mywebsite,
+        incremental=incremental
         )
 
     elif mywebsite=='investing':
@@ -190,7 +220,9 @@ def runner(start,
 
         print(len(list(mysymboldict)))
         my_intraday_obj=Intraday_Investing(url=list(mysymboldict.values())[0][2],
-                                           interval=ticker_interval)
+                                           interval=ticker_interval,
+                                           source=source,
+                                           symbol=list(mysymboldict.values())[0][0])
         
         _save_data(#Intraday_data_files,
             Intraday_data_files_pq,
@@ -199,12 +231,18 @@ def runner(start,
             return_interval=ticker_interval,
             IntradayObject=my_intraday_obj,
             mysymboldict=mysymboldict,
-            website=mywebsite
+            website=mywebsite,
+            incremental=incremental
             )
         
    
 # Read current dataset of historical data
 INTRADAY_FILES_PQ = "Intraday_data_files_pq"
+# Append new bars to the OHLC store instead of rewriting the full history on every run.
+# Datasets not in the store yet go through the full merge once to seed it.
+INCREMENTAL_INGEST = True
+# None: live data. price_sources.ReplaySource() / SyntheticSource() run the pipeline offline (profiling, load tests)
+PRICE_SOURCE = None
 if __name__=='__main__':
     ### Make Folders to Store Data
     os.makedirs(INTRADAY_FILES_PQ, exist_ok=True)
@@ -220,7 +258,8 @@ if __name__=='__main__':
     os.makedirs(DAILY_FILES_PQ)
 
     # Temporary file to hold new Intraday data. Later gets renamed to "Intraday_data_files" after new and old data gets Merged
-    os.makedirs('temp_pq' , exist_ok = True)
+    if not INCREMENTAL_INGEST:
+        os.makedirs('temp_pq' , exist_ok = True)
     
     # Case:1
     runner(start=-1,
@@ -230,7 +269,9 @@ if __name__=='__main__':
         #    Intraday_data_files=INTRADAY_FILES,
            Intraday_data_files_pq=INTRADAY_FILES_PQ,
         #    Daily_backup_files=DAILY_FILES,
-           Daily_backup_files_pq=DAILY_FILES_PQ
+           Daily_backup_files_pq=DAILY_FILES_PQ,
+           incremental=INCREMENTAL_INGEST,
+           source=PRICE_SOURCE
           )
 
     
@@ -242,7 +283,9 @@ if __name__=='__main__':
         #    Intraday_data_files=INTRADAY_FILES,
            Intraday_data_files_pq=INTRADAY_FILES_PQ,
         #    Daily_backup_files=DAILY_FILES,
-           Daily_backup_files_pq=DAILY_FILES_PQ
+           Daily_backup_files_pq=DAILY_FILES_PQ,
+           incremental=INCREMENTAL_INGEST,
+           source=PRICE_SOURCE
           )
     
 
@@ -254,7 +297,9 @@ if __name__=='__main__':
         #    Intraday_data_files=INTRADAY_FILES,
            Intraday_data_files_pq=INTRADAY_FILES_PQ,
         #    Daily_backup_files=DAILY_FILES,           
-           Daily_backup_files_pq=DAILY_FILES_PQ
+           Daily_backup_files_pq=DAILY_FILES_PQ,
+           incremental=INCREMENTAL_INGEST,
+           source=PRICE_SOURCE
           )
     
 
@@ -266,7 +311,9 @@ if __name__=='__main__':
         #    Intraday_data_files=INTRADAY_FILES,
            Intraday_data_files_pq=INTRADAY_FILES_PQ,
         #    Daily_backup_files=DAILY_FILES,
-           Daily_backup_files_pq=DAILY_FILES_PQ
+           Daily_backup_files_pq=DAILY_FILES_PQ,
+           incremental=INCREMENTAL_INGEST,
+           source=PRICE_SOURCE
           )
     
     # Case:5: FGBL from investing.com
@@ -282,25 +329,31 @@ if __name__=='__main__':
     #     mywebsite='investing'
     # )
 
-    directory_path_pq = INTRADAY_FILES_PQ
-    try:
-        shutil.rmtree(directory_path_pq)
-        print(f"Directory {directory_path_pq} and its contents deleted successfully.")
-    except FileNotFoundError:
-        print("The directory does not exist (pq).")
-    except PermissionError:
-        print("You do not have the necessary permissions to delete this directory (pq).")
+    # Wait for any background compaction to finish writing before the run ends
+    for thread in COMPACTION_THREADS:
+        thread.join()
+
+    # Incremental runs update the files in place, only a full rewrite goes through temp_pq
+    if not INCREMENTAL_INGEST:
+        directory_path_pq = INTRADAY_FILES_PQ
+        try:
+            shutil.rmtree(directory_path_pq)
+            print(f"Directory {directory_path_pq} and its contents deleted successfully.")
+        except FileNotFoundError:
+            print("The directory does not exist (pq).")
+        except PermissionError:
+            print("You do not have the necessary permissions to delete this directory (pq).")
     
-    #Rename "temp_pq" as "Intraday_data_files_pq directory" 
-    current_name = "temp_pq"
-    new_name = "Intraday_data_files_pq"
+        #Rename "temp_pq" as "Intraday_data_files_pq directory" 
+        current_name = "temp_pq"
+        new_name = "Intraday_data_files_pq"
     
-    try:
-        os.rename(current_name, new_name)
-        print(f"Directory renamed from '{current_name}' to '{new_name}'")
-    except FileNotFoundError:
-        print(f"Directory '{current_name}' not found (pq)!")
-    except PermissionError:
-        print("You do not have permission to rename this directory (pq).")
-    except Exception as e:
-        print(f"An error occurred (pq): {e}")
+        try:
+            os.rename(current_name, new_name)
+            print(f"Directory renamed from '{current_name}' to '{new_name}'")
+        except FileNotFoundError:
+            print(f"Directory '{current_name}' not found (pq)!")
+        except PermissionError:
+            print("You do not have permission to rename this directory (pq).")
+        except Exception as e:
+            print(f"An error occurred (pq): {e}")
@@ -1,4 +1,8 @@
 import pandas as pd
+
+# Time given to day bars, which come without one
+END_OF_DAY = pd.Timedelta(hours=23, minutes=59, seconds=59)
+
 class ManipulateTimezone:
     """
     Pre-process the Historical Data to convert to desired timezone
@@ -7,7 +11,8 @@ class ManipulateTimezone:
     def __init__(self,data):
         self.dataframe=pd.DataFrame(data)
 
-    def _check_timezone(self, checkdf="", tz_col="", default_tz = "Asia/Kolkata", target_tz = "US/Eastern"):
+    def _check_timezone(self, checkdf="", tz_col="", default_tz = "Asia/Kolkata", target_tz = "US/Eastern",
+                        ambiguous="raise", nonexistent="raise"):
         """
         Checks the timezone of a timestamp column in the DataFrame and 
         converts it to target timezone
@@ -16,6 +21,10 @@ class ManipulateTimezone:
             dataframe (pd.DataFrame): Instrument Data with intra-day data in a Pandas DataFrame.
             tz_col (str, optional): Name of the column containing datetime values.
                                     If not provided, the method will attempt to detect it.
+            ambiguous, nonexistent (optional): How naive times that are ambiguous / don't exist in default_tz
+                                    (DST transitions) are localized, as in Series.dt.tz_localize.
+                                    'raise' (default) fails like the per-timestamp conversion always did;
+                                    e.g. 'NaT' or 'shift_forward' resolve them instead.
 
         Returns:
             pd.DataFrame: DataFrame with the timezone converted to US/Eastern.
@@ -36,13 +45,20 @@ class ManipulateTimezone:
         # Convert column to datetime format
         dataframe[tz_col]=pd.to_datetime(dataframe[tz_col])
 
-        # Apply timezone conversion
-        dataframe[tz_col]=dataframe[tz_col].apply(
-            lambda tz_info:self._convert_timezone(tz_info,default_tz,target_tz))
+        # Apply timezone conversion: one vectorized localize/convert for a naive or a single-timezone column
+        column=dataframe[tz_col]
+        if isinstance(column.dtype, pd.DatetimeTZDtype):
+            dataframe[tz_col]=column.dt.tz_convert(target_tz)
+        elif pd.api.types.is_datetime64_dtype(column):
+            dataframe[tz_col]=column.dt.tz_localize(default_tz, ambiguous=ambiguous, nonexistent=nonexistent).dt.tz_convert(target_tz)
+        else:
+            # Mixed offsets / mixed naive and aware values stay object dtype: convert them one by one
+            dataframe[tz_col]=column.apply(
+                lambda tz_info:self._convert_timezone(tz_info,default_tz,target_tz,ambiguous,nonexistent))
         return dataframe
     
     @staticmethod
-    def _convert_timezone(tz_info, default_tz, target_tz):
+    def _convert_timezone(tz_info, default_tz, target_tz, ambiguous="raise", nonexistent="raise"):
         """
         Converts a single timestamp to the target timezone.
 
@@ -55,13 +71,13 @@ class ManipulateTimezone:
             pd.Timestamp: Timestamp converted to the target timezone.
         """
         if tz_info.tzinfo is None:  # Check if timezone is missing
-            tz_info = tz_info.tz_localize(default_tz)
+            tz_info = tz_info.tz_localize(default_tz, ambiguous=ambiguous, nonexistent=nonexistent)
         tz_info=tz_info.tz_convert(target_tz)
         return tz_info
     
 
-    def change_timezone(self,checkdf,tz_col, default_tz,target_tz):
-        return self._check_timezone(checkdf,tz_col, default_tz,target_tz)
+    def change_timezone(self,checkdf,tz_col, default_tz,target_tz, ambiguous="raise", nonexistent="raise"):
+        return self._check_timezone(checkdf,tz_col, default_tz,target_tz, ambiguous, nonexistent)
     
 
     @staticmethod
@@ -69,8 +85,18 @@ class ManipulateTimezone:
         # Convert 1d interval dataframe to datetime. It adds  00:00:00 by default since no time value.
         day_interval_dataframe[target_col] = pd.to_datetime(day_interval_dataframe[target_col], errors='coerce')
 
-        # Change time of rows to 23:59:59
-        day_interval_dataframe[target_col] = day_interval_dataframe[target_col].apply(lambda x: x.replace(hour=23, minute=59, second=59))
+        # Change time of rows to 23:59:59: midnight of the day + 23:59:59, keeping any sub-second part
+        column = day_interval_dataframe[target_col]
+        if isinstance(column.dtype, pd.DatetimeTZDtype):
+            # Work on the wall clock so DST days still end at 23:59:59 local time
+            tz = column.dt.tz
+            wall = column.dt.tz_localize(None)
+            wall = wall.dt.normalize() + END_OF_DAY + (wall - wall.dt.floor('s'))
+            day_interval_dataframe[target_col] = wall.dt.tz_localize(tz, ambiguous='raise', nonexistent='raise')
+        elif pd.api.types.is_datetime64_dtype(column):
+            day_interval_dataframe[target_col] = column.dt.normalize() + END_OF_DAY + (column - column.dt.floor('s'))
+        else:
+            day_interval_dataframe[target_col] = column.apply(lambda x: x.replace(hour=23, minute=59, second=59))
         
         return day_interval_dataframe
     
@@ -0,0 +1,246 @@
+"""
+Price sources for the ingestion pipeline.
+
+Intraday and Intraday_Investing get their bars from a PriceSource. YahooFinanceSource (the default)
+calls yf.download. ReplaySource and SyntheticSource serve recorded or generated bars offline, so
+_save_data, the runners and the returns pipeline can be run, profiled and load-tested deterministically.
+"""
+
+import re
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from models.catalog import CATALOG
+
+PRICE_COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+_INTERVAL_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'wk': 'weeks'}
+
+
+def interval_timedelta(interval):
+    """Length of one bar: '1m' -> 1 minute, '1h' -> 1 hour, '1d' -> 1 day ('1mo' counts as 31 days)."""
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval)
+    if match is None:
+        raise ValueError(f'Unknown interval: {interval}')
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'mo':
+        return pd.Timedelta(days=31 * count)
+    return pd.Timedelta(**{_INTERVAL_UNITS[unit]: count})
+
+
+def is_daily_or_longer(interval):
+    # yfinance stamps these bars with naive dates instead of UTC times
+    return interval.endswith(('d', 'wk', 'mo'))
+
+
+def to_yfinance_layout(frames):
+    """{ticker: OHLCV frame} -> one frame with (Price, Ticker) columns, as yf.download returns for a ticker list."""
+    frames = {ticker: bars for ticker, bars in frames.items() if not bars.empty}
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+    data = data.swaplevel(axis=1).sort_index(axis=1, level='Price', sort_remaining=False)
+    data.index.name = 'Datetime'
+    return data
+
+
+class PriceSource(ABC):
+    """
+    Base class of the price sources.
+
+    download() returns bars in the yf.download layout: (Price, Ticker) columns with Close, High, Low,
+    Open, Volume and a Datetime index. Subclasses implement _bars() for one ticker.
+
+    Args:
+        latency (float): Seconds slept per download() call (simulated network round trip).
+        bars_per_second (float, optional): Throttle the rate bars are served at.
+    """
+
+    def __init__(self, latency=0.0, bars_per_second=None):
+        self.latency = latency
+        self.bars_per_second = bars_per_second
+        self.calls = 0
+        self.bars_served = 0
+
+    def download(self, tickers, interval, symbols=None, start=None, end=None, period=None):
+        """
+        Args:
+            tickers (list): Yahoo tickers, e.g. 'ZN=F'.
+            interval (str): Bar interval, e.g. '1m', '1h', '1d'.
+            symbols (list, optional): Dataset symbol of each ticker (e.g. 'ZN'), defaults to the tickers.
+            start, end: Request window, as accepted by yf.download.
+            period (str, optional): Look-back window instead of start/end, e.g. '7d'.
+        """
+        frames = {ticker: self._bars(ticker, symbol, interval, start, end, period)
+                  for ticker, symbol in zip(tickers, symbols or tickers)}
+        data = to_yfinance_layout(frames)
+
+        n_bars = sum(len(bars) for bars in frames.values())
+        self.calls += 1
+        self.bars_served += n_bars
+        delay = self.latency + (n_bars / self.bars_per_second if self.bars_per_second else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+    @abstractmethod
+    def _bars(self, ticker, symbol, interval, start, end, period):
+        """OHLCV bars (PRICE_COLUMNS, Datetime index) of one ticker inside the request window."""
+
+
+class YahooFinanceSource(PriceSource):
+    """Live bars from Yahoo Finance."""
+
+    def download(self, tickers, interval, symbols=None, start=None, end=None, period=None):
+        kwargs = {key: value for key, value in (('start', start), ('end', end), ('period', period))
+                  if value is not None}
+        self.calls += 1
+        return yf.download(tickers=tickers, interval=interval, **kwargs)
+
+    def _bars(self, ticker, symbol, interval, start, end, period):
+        data = self.download([ticker], interval, start=start, end=end, period=period)
+        if data.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        return data.xs(ticker, axis=1, level='Ticker')[PRICE_COLUMNS]
+
+
+def _clip_window(bars, start, end, period):
+    """Rows of bars inside the request window. period counts back from the last bar, not the wall clock."""
+    if bars.empty:
+        return bars
+    index = bars.index
+
+    def align(ts):
+        ts = pd.Timestamp(ts)
+        if index.tz is None:
+            return ts.tz_convert('UTC').tz_localize(None) if ts.tz is not None else ts
+        return ts.tz_localize('UTC') if ts.tz is None else ts
+
+    mask = np.ones(len(bars), dtype=bool)
+    if period is not None:
+        mask &= index > index[-1] - pd.Timedelta(period)
+    if start is not None:
+        mask &= index >= align(start)
+    if end is not None:
+        mask &= index < align(end)
+    return bars[mask]
+
+
+class ReplaySource(PriceSource):
+    """
+    Serves recorded bars, by default the Intraday_<symbol>_<interval>_<start>_to_<end>.parquet backups in
+    Daily_backup_files_pq (found through the dataset catalog). Several recordings of a symbol are merged,
+    the newest winning on overlapping bars.
+
+    Args:
+        folder (str): Folder holding the recordings.
+        respect_window (bool): Clip to the requested start/end/period. Off by default: the request windows
+            are relative to the wall clock, while a replay should serve the same bars on every run.
+    """
+
+    def __init__(self, folder='Daily_backup_files_pq', respect_window=False, latency=0.0, bars_per_second=None):
+        super().__init__(latency, bars_per_second)
+        self.folder = folder
+        self.respect_window = respect_window
+        self._recordings = {}  # (symbol, interval) -> bars, loaded once
+
+    def _recorded(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._recordings:
+            entries = sorted(
+                (e for e in CATALOG.entries(self.folder)
+                 if e.kind == 'backup' and e.instrument == symbol and e.interval == interval
+                 and e.file_type == '.parquet'),
+                key=lambda e: (e.start, e.end))
+            if entries:
+                bars = pd.concat([pd.read_parquet(e.path) for e in entries])
+                bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+            else:
+                print(f'No recording of {symbol} {interval} in {self.folder}')
+                bars = pd.DataFrame(columns=PRICE_COLUMNS)
+            self._recordings[key] = bars
+        return self._recordings[key]
+
+    def _bars(self, ticker, symbol, interval, start, end, period):
+        bars = self._recorded(symbol, interval)
+        if self.respect_window:
+            bars = _clip_window(bars, start, end, period)
+        return bars.copy()
+
+
+class SyntheticSource(PriceSource):
+    """
+    Generates a random-walk OHLCV series per symbol, deterministic for a given (seed, symbol, interval, now).
+
+    Args:
+        n_bars (int): Bars served per ticker and request.
+        now (timestamp, optional): Time of the last bar; defaults to the current bar of the wall clock.
+            Fix it for runs that must be reproducible across days.
+        respect_window (bool): Generate the requested start/end/period window instead of n_bars.
+        max_bars (int): Upper bound on the bars generated for a requested window.
+    """
+
+    def __init__(self, n_bars=500, seed=0, now=None, respect_window=False, max_bars=1_000_000,
+                 latency=0.0, bars_per_second=None):
+        super().__init__(latency, bars_per_second)
+        self.n_bars = n_bars
+        self.seed = seed
+        self.now = now
+        self.respect_window = respect_window
+        self.max_bars = max_bars
+
+    def _index(self, interval, start, end, period):
+        step = interval_timedelta(interval)
+        now = pd.Timestamp(self.now) if self.now is not None else pd.Timestamp.now(tz='UTC')
+        now = now.tz_localize('UTC') if now.tz is None else now.tz_convert('UTC')
+        last = now.floor(step) if step <= pd.Timedelta(days=1) else now.floor('1D')
+        if self.respect_window and (start is not None or period is not None):
+            first = last - pd.Timedelta(period) if period is not None else pd.Timestamp(start)
+            first = first.tz_localize('UTC') if first.tz is None else first.tz_convert('UTC')
+            if end is not None:
+                end = pd.Timestamp(end)
+                last = min(last, (end.tz_localize('UTC') if end.tz is None else end.tz_convert('UTC')) - step)
+            index = pd.date_range(first.ceil(step) if step <= pd.Timedelta(days=1) else first.ceil('1D'),
+                                  last, freq=step)[-self.max_bars:]
+        else:
+            index = pd.date_range(end=last, periods=self.n_bars, freq=step)
+        if is_daily_or_longer(interval):
+            index = index.tz_localize(None)
+        return index.rename('Datetime')
+
+    def _bars(self, ticker, symbol, interval, start, end, period):
+        index = self._index(interval, start, end, period)
+        n = len(index)
+        rng = np.random.default_rng([self.seed, sum(map(ord, symbol + interval))])
+        close = 100 + np.cumsum(rng.normal(0, 0.05, n))
+        open_ = np.concatenate([close[:1], close[:-1]])
+        spread = np.abs(rng.normal(0, 0.03, n))
+        return pd.DataFrame({'Close': close,
+                             'High': np.maximum(open_, close) + spread,
+                             'Low': np.minimum(open_, close) - spread,
+                             'Open': open_,
+                             'Volume': rng.integers(0, 1000, n).astype(float)}, index=index)
+
+
+INVESTING_COLUMNS = ['Datetime', 'Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume', '%Change']
+INVESTING_TABLE_HEADING = ['Date', 'Price', 'Open', 'High', 'Low', 'Vol.', 'Change %']
+
+
+def fetch_investing_table(source, symbol, interval, export):
+    """
+    Intraday_Investing.FetchFromSource: bars of symbol from source, formatted like the rows scraped from the
+    investing.com historical-data table and handed to export (the ExportCSV of the caller).
+    """
+    bars = source.download([symbol], interval, symbols=[symbol])
+    if bars.empty:
+        return pd.DataFrame(columns=INVESTING_COLUMNS)
+    bars = bars.xs(symbol, axis=1, level='Ticker').sort_index(ascending=False)  # site lists the newest first
+    change = bars['Close'].pct_change(-1).fillna(0) * 100
+    table_row_list = [[*ts.strftime('%b %d %Y').split(' '), f"{close:.3f}", f"{open_:.3f}", f"{high:.3f}",
+                       f"{low:.3f}", f"{volume:.0f}", f"{pct:.2f}%"]
+                      for ts, close, open_, high, low, volume, pct in zip(bars.index, bars['Close'], bars['Open'],
+                                                                         bars['High'], bars['Low'], bars['Volume'],
+                                                                         change)]
+    return export(INVESTING_TABLE_HEADING, table_row_list, interval)
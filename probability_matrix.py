@@ -1,5 +1,4 @@
 import os
-import re
 import numpy as np
 import pandas as pd
 import matplotlib
@@ -7,9 +6,15 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from returns_main import folder_processed_pq
+from returns_main import folder_processed_pq, folder_matrix_cache
 
+from models.catalog import find_dataset, resolve_dataset
 from views.plotting import plot_data
+from models.data_loader import dataset_fingerprint, load_raw_prices
+from utils.result_cache import ResultCache
+
+# Persistent cache of GetMatrix results, cleared by returns_main when the processed folder is rebuilt
+MATRIX_CACHE = ResultCache(folder_matrix_cache, max_bytes=512 * 1024 * 1024)
 
 
 def GetMatrix(
@@ -19,6 +24,7 @@ def GetMatrix(
     ticker_name: str,
     data_type: str,
     version: str = "NA",
+    use_cache: bool = True,
 ):
     """
     Locate parquet data, build probability matrices, and generate plots.
@@ -35,6 +41,8 @@ def GetMatrix(
             - 'Up': Keep only upward moves.
             - 'Down': Keep only downward moves.
             - 'NA': Compute all three versions.
+        use_cache (bool): Reuse results stored in MATRIX_CACHE for the same data file
+            (path, mtime, size) and parameters.
 
     Returns:
         dict: Mapping from version -> dict containing:
@@ -42,36 +50,29 @@ def GetMatrix(
             - "Returns_Matrix": Probability matrix DataFrames.
             - "Plots": Distribution plots.
     """
-    df = pd.DataFrame()  # Will hold parquet data once loaded
-
-    # Regex pattern to match event parquet filenames
-    pattern = re.compile(r"Intraday_data_ZN_1h_2022-12-20_to_(\d{4}-\d{2}-\d{2})\.parquet")
-
     # -------- Locate parquet file --------
     if data_type == "Non-Event":
-        # Loop through folder for non-event data
-        for file in os.scandir(folder_processed_pq):
-            if not file.is_file():
-                continue
-            if (
-                interval in file.name
-                and ticker_name in file.name
-                and "nonevents" in file.name
-                and "target_tz" in file.name
-                and file.name.endswith(".parquet")
-            ):
-                print("data used for Probabilty Matrix:", file.name)
-                df = pd.read_parquet(os.path.join(folder_processed_pq, file.name))
-                break
+        # Non-event tagged data; arg order doesn't matter to the catalog
+        entry = resolve_dataset(folder_processed_pq, [interval, ticker_name, "nonevents"])
     else:
-        # Look in event data folder
-        for file in os.scandir("Intraday_data_files_pq"):
-            if not file.is_file():
-                continue
-            if pattern.match(file.name):
-                print("data used for Probabilty Matrix:", file.name)
-                df = pd.read_parquet(os.path.join("Intraday_data_files_pq", file.name))
-                break
+        # Event path always uses the raw ZN 1h data
+        entry = find_dataset("Intraday_data_files_pq", "ZN", "1h", "raw")
+    file_path = entry.path if entry is not None else None
+
+    if file_path is None:
+        raise FileNotFoundError("No suitable parquet found for the Probability Matrix inputs.")
+
+    # -------- Cached result --------
+    cache_key = (dataset_fingerprint(entry), float(target_bps), int(target_hrs), version, data_type)
+    if use_cache:
+        cached = MATRIX_CACHE.get(cache_key)
+        if cached is not None:
+            print("Probability Matrix loaded from cache:", os.path.basename(file_path))
+            return cached
+
+    print("data used for Probabilty Matrix:", os.path.basename(file_path))
+    # Raw bars come from the OHLC store when it is ahead of the monolithic file
+    df = load_raw_prices(entry) if entry.kind == "raw" else pd.read_parquet(file_path)
 
     if df.empty:
         raise FileNotFoundError("No suitable parquet found for the Probability Matrix inputs.")
@@ -100,6 +101,9 @@ def GetMatrix(
         version_dic[ver]["Plots"] = graphs_dict
         version_dic[ver]['Latest movt'] = my_matrix.latest_movt_data
 
+    if use_cache:
+        MATRIX_CACHE.set(cache_key, version_dic)
+
     return version_dic
 
 
@@ -125,6 +129,7 @@ class ProbabilityMatrix:
         self.less_than_equal_percentile_list = None  # Stores computed <= percentiles
         self.prob_matrix_dict = None  # Stores probability matrices for each mode
         self.latest_movt_data = None
+        self.block_moves_cache = {}  # hrs window range -> raw block moves, shared by all versions
  
     # ---------------------- helpers ----------------------
 
@@ -229,6 +234,83 @@ class ProbabilityMatrix:
         fig.tight_layout()
         return fig 
 
+    # ---------------------- block engine ----------------------
+    def _segment_bounds(self):
+        """
+        Start row and length of every contiguous segment (rows with the same 'gap' id).
+
+        Returns:
+            tuple: (np.ndarray of segment start rows, np.ndarray of segment lengths).
+        """
+        gap = self.df['gap'].to_numpy()
+        if len(gap) == 0:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+        seg_starts = np.flatnonzero(np.r_[True, gap[1:] != gap[:-1]])
+        seg_lengths = np.diff(np.r_[seg_starts, len(gap)])
+        return seg_starts, seg_lengths
+
+    def calc_block_moves(self, hrs_list):
+        """
+        Compute the rounded bps move of every full block of every window size, for the three modes.
+
+        Each contiguous segment is cut into n // hrs consecutive blocks of hrs rows (the leftover rows at
+        the end of the segment are ignored). Block open/close are picked by index and block high/low are
+        reduced with np.fmax/np.fmin.reduceat over the precomputed block boundaries, so no per-block
+        DataFrame slicing is needed.
+
+        Args:
+            hrs_list (list): Window sizes (in rows) to compute.
+
+        Returns:
+            dict: hrs -> {'Datetime': block start times, 'open-close', 'open-high/low', 'high-low': np.ndarray},
+                blocks in the same order as the segments and rows of the dataframe.
+        """
+        seg_starts, seg_lengths = self._segment_bounds()
+
+        opens = self.df['Open'].to_numpy(dtype=float)
+        closes = self.df['Close'].to_numpy(dtype=float)
+        # Trailing NaN sentinel keeps the end boundary of a block that ends the frame a valid reduceat index
+        highs = np.append(self.df['High'].to_numpy(dtype=float), np.nan)
+        lows = np.append(self.df['Low'].to_numpy(dtype=float), np.nan)
+        times = self.df['US/Eastern Timezone']
+
+        block_moves = {}
+        for hrs in hrs_list:
+            full_blocks = seg_lengths // hrs
+            n_blocks = int(full_blocks.sum())
+
+            # Block start rows: segment start + (block number within the segment) * hrs
+            first_block = np.cumsum(full_blocks) - full_blocks
+            block_no = np.arange(n_blocks) - np.repeat(first_block, full_blocks)
+            starts = np.repeat(seg_starts, full_blocks) + block_no * hrs
+            ends = starts + hrs
+
+            if n_blocks:
+                # reduceat reduces a[idx[i]:idx[i+1]]; interleave (start, end) and keep the even slots
+                bounds = np.empty(2 * n_blocks, dtype=np.intp)
+                bounds[0::2] = starts
+                bounds[1::2] = ends
+                block_high = np.fmax.reduceat(highs, bounds)[0::2]
+                block_low = np.fmin.reduceat(lows, bounds)[0::2]
+            else:
+                block_high = np.array([], dtype=float)
+                block_low = np.array([], dtype=float)
+
+            open_price = opens[starts]
+            close_price = closes[ends - 1]
+            up_move = block_high - open_price
+            down_move = open_price - block_low
+
+            # Convert moves into bps (multiplied by 16). np.where keeps builtin max() semantics for NaN.
+            block_moves[hrs] = {
+                'Datetime': times.iloc[starts].reset_index(drop=True),
+                'open-close': self.round_off((close_price - open_price) * 16),
+                'open-high/low': self.round_off(np.where(down_move > up_move, down_move, up_move) * 16),
+                'high-low': self.round_off((block_high - block_low) * 16),
+            }
+
+        return block_moves
+
     # ---------------------- main ----------------------
     def calc_prob(self, target_bps, target_hrs, version):
         """
@@ -267,68 +349,32 @@ class ProbabilityMatrix:
         # Dict of all movements across hours (used for matrix building)
         all_movt_dict = {'open-close': [], 'open-high/low': [], 'high-low': []}
 
-        #dict storing the latest for target_hrs for the 3 modes
-        latest_moves_dict = {}
-        df1 = pd.DataFrame(columns=["Datetime", "Bps moved"])
-        df2 = pd.DataFrame(columns=["Datetime", "Bps moved"])
-        df3 = pd.DataFrame(columns=["Datetime", "Bps moved"])
-
         # Iterate over window sizes (target_hrs ± 10)
-        for hrs in range(max(1, target_hrs-10), target_hrs + 11):
-
-            # Ensure lists exist
-            for mode in returns_dict:
-                if hrs not in returns_dict[mode]:
-                    returns_dict[mode][hrs] = []
-
-            # Process each contiguous segment separately
-            for _, segment in data.groupby('gap'):
-                n = len(segment)
-                full_blocks = n // hrs  # number of complete blocks of length hrs
-
-                if full_blocks == 0:
-                    # Not enough data for this segment
-                    for mode in returns_dict:
-                        returns_dict[mode][hrs].append(np.nan)
-                else:
-                    # Process each block
-                    for i in range(full_blocks):
-                        block = segment.iloc[i*hrs:(i+1)*hrs]
-
-                        open_price = block['Open'].iloc[0]
-                        close_price = block['Close'].iloc[-1]
-                        block_high = block['High'].max()
-                        block_low = block['Low'].min()
-
-                        # Convert moves into bps (multiplied by 16)
-                        ret1 = self.round_off((close_price - open_price) * 16)
-                        ret2 = self.round_off(max(block_high-open_price, open_price-block_low) * 16)
-                        ret3 = self.round_off((block_high - block_low) * 16)
-
-                        returns_dict['open-close'][hrs].append(ret1)
-                        returns_dict['open-high/low'][hrs].append(ret2)
-                        returns_dict['high-low'][hrs].append(ret3)
-
-                        if(hrs == target_hrs):
-                            r1 = pd.DataFrame([{"Datetime": block['US/Eastern Timezone'].iloc[0] , "Bps moved": ret1}])
-                            r2 = pd.DataFrame([{"Datetime": block['US/Eastern Timezone'].iloc[0] , "Bps moved": ret2}])
-                            r3 = pd.DataFrame([{"Datetime": block['US/Eastern Timezone'].iloc[0] , "Bps moved": ret3}])
-                            df1 = pd.concat([df1, r1], ignore_index=True)
-                            df2 = pd.concat([df2, r2], ignore_index=True)
-                            df3 = pd.concat([df3, r3], ignore_index=True)
+        hrs_list = list(range(max(1, target_hrs-10), target_hrs + 11))
 
+        # Raw block moves don't depend on the version, so they are computed once per window range
+        # and every version (Absolute/Up/Down) only applies its own filter on top of them.
+        hrs_key = (hrs_list[0], hrs_list[-1])
+        if hrs_key not in self.block_moves_cache:
+            self.block_moves_cache[hrs_key] = self.calc_block_moves(hrs_list)
+        block_moves = self.block_moves_cache[hrs_key]
+
+        for hrs in hrs_list:
             # Apply version filters + clean nans
             for mode in ['open-close', 'open-high/low', 'high-low']:
-                returns_dict[mode][hrs] = apply_version_filter(returns_dict[mode][hrs], version)
-                cleaned_arr = returns_dict[mode][hrs][~np.isnan(returns_dict[mode][hrs])]
-                returns_dict[mode][hrs] = cleaned_arr
+                filtered_arr = apply_version_filter(block_moves[hrs][mode], version)
+                returns_dict[mode][hrs] = filtered_arr[~np.isnan(filtered_arr)]
 
                 # Collect all movements for this mode
                 all_movt_dict[mode].extend(returns_dict[mode][hrs])
 
-        latest_moves_dict['open-close'] = df1
-        latest_moves_dict['open-high/low'] = df2
-        latest_moves_dict['high-low'] = df3
+        #dict storing the latest for target_hrs for the 3 modes
+        latest_moves_dict = {}
+        for mode in ['open-close', 'open-high/low', 'high-low']:
+            latest_moves_dict[mode] = pd.DataFrame({
+                "Datetime": block_moves[target_hrs]['Datetime'],
+                "Bps moved": block_moves[target_hrs][mode],
+            })
 
         self.latest_movt_data = latest_moves_dict
 
@@ -354,6 +400,43 @@ class ProbabilityMatrix:
         return graphs_dict
 
     # ---------------------- matrix builders ----------------------
+    @staticmethod
+    def exceedance_probability(bps_values, thresholds):
+        """
+        Empirical Pr(bps > threshold) in % for every threshold.
+
+        The sample is sorted once and the ECDF is read off at all thresholds with a single
+        np.searchsorted, i.e. O((N + U) log N) instead of one pass over the sample per threshold.
+
+        Args:
+            bps_values (array-like): Sample of bps moves.
+            thresholds (array-like): Thresholds (bps).
+
+        Returns:
+            np.ndarray: 100 - Pr(bps <= threshold) * 100 for each threshold.
+        """
+        sorted_values = np.sort(np.asarray(bps_values, dtype=float))
+        count_le = np.searchsorted(sorted_values, np.asarray(thresholds, dtype=float), side='right')
+        return 100.0 - (count_le / len(sorted_values)) * 100.0
+
+    @staticmethod
+    def format_percent(pr_array):
+        """
+        Format probabilities as 'xx.xx%' strings.
+
+        Rounded probabilities repeat a lot, so only the distinct values are formatted and
+        the labels are gathered back with the inverse index.
+
+        Args:
+            pr_array (np.ndarray): Probabilities in %.
+
+        Returns:
+            np.ndarray: Object array of strings like '33.33%'.
+        """
+        unique_pr, inverse = np.unique(np.round(pr_array, 2), return_inverse=True)
+        labels = np.array([f"{pr}%" for pr in unique_pr.tolist()], dtype=object)
+        return labels[inverse.reshape(-1)]
+
     def _calc_prob_matrix_helper(self, prob_matrix_dict, unique_bps_array):
         """
         Construct cumulative probability distributions across ordered hours.
@@ -373,12 +456,9 @@ class ProbabilityMatrix:
         percentile_bps_array_for_all_hours = []
         for h in ordered_hours:
             if len(prob_matrix_dict[h]) > 0:
-                bps_values = np.array(prob_matrix_dict[h], dtype=float)
-
                 # Probability of exceeding each threshold
-                pr_gt = 100.0 - np.array([np.mean(bps_values <= tb) * 100.0 for tb in unique_bps_array])
-                pr_fmt = np.char.add(np.round(pr_gt, 2).astype(str), '%')
-                percentile_bps_array_for_all_hours.append(pr_fmt)
+                pr_gt = self.exceedance_probability(prob_matrix_dict[h], unique_bps_array)
+                percentile_bps_array_for_all_hours.append(self.format_percent(pr_gt))
             else:
                 percentile_bps_array_for_all_hours.append(np.nan)
 
@@ -7,7 +7,46 @@ from nonevents import Nonevents
 from periodic_runner_main import INTRADAY_FILES as Intraday_data_files
 import shutil
 import os
+import json
+import hashlib
+import inspect
 from tzlocal import get_localzone 
+from utils.result_cache import ResultCache
+from utils.pipeline import PipelineRunner, Stage
+from models.catalog import CATALOG, find_dataset, parse_file_name
+from models.data_loader import load_raw_prices, store_is_current
+from models.ohlc_store import OHLC_STORE_ROOT, store_files
+from models.processed_schema import write_processed_parquet
+from models.event_store import build_event_store, write_event_store
+
+# Calendars appended to the events sheet: {timezone: [region]}, read from <timezone>_<region>_*.csv (see Events.append_new_events)
+ADD_NEW_EVENTS_DIC = {'IST': ['US']}
+# Parsed year sheets of the events workbook, keyed on its SHA-1 (see Events.read_sheets)
+EVENT_SHEET_CACHE = os.path.join('.result_cache', 'event_sheets')
+# Bump when the processed files change for a reason the stage versions can't see (e.g. a pandas upgrade)
+PIPELINE_VERSION = 1
+
+# Tier and flag dictionaries of the events calendar
+TIER1_EVENTS = ["CPI", "PPI", "PCE", "Core Inflation", "NFP", "Unemployment", "Payrolls"]
+TIER2_EVENTS = ["JOLTs", "ADP", "PMI","Auction", "Retail Sales",]
+TIER3_EVENTS = [
+    "Consumer Confidence",
+    "Weekly Jobless Claims",
+    "Industrial Production",
+    "Challenger Job Cuts",
+    "Consumer Inflation"
+]
+MACRO_EVENTS = TIER1_EVENTS + TIER2_EVENTS + TIER3_EVENTS
+TIER_DIC = {event: 1 if event in TIER1_EVENTS else 2 if event in TIER2_EVENTS else 3 if event in TIER3_EVENTS else 4
+            for event in MACRO_EVENTS}
+FLAG_DIC = {
+    "IND_MACRO": MACRO_EVENTS,
+    "IND_Tier1": TIER1_EVENTS,
+    "IND_Tier2": TIER2_EVENTS,
+    "IND_Tier3": TIER3_EVENTS,
+    "IND_FED": ["FOMC", "Speech", "Beige", "Speak"],
+}
+
 
 def _change_event_tiers(
     events_data_folder,
@@ -15,7 +54,9 @@ def _change_event_tiers(
     events_data_path,
     default_tz="Asia/Kolkata",
     target_tz="US/Eastern",
-    change_tiers_bool=True
+    change_tiers_bool=True,
+    tier_dic=None,
+    flag_dic=None,
 ):
     """
     Prepares and processes economic event data by combining, assigning tiers and flags,
@@ -27,51 +68,23 @@ def _change_event_tiers(
         events_data (str): Name of the Excel file containing event data.
         default_tz (str): The default timezone of the input data. Default is "Asia/Kolkata".
         target_tz (str): The target timezone for the processed data. Default is "US/Eastern".
+        tier_dic (dict, optional): Event name -> tier. Default is TIER_DIC.
+        flag_dic (dict, optional): Flag column -> event names. Default is FLAG_DIC.
 
     Returns:
         str: Path to the final processed file with timestamps in the target timezone.
     """
 
-    # Define tier and flag dictionaries
-    tier1_events = ["CPI", "PPI", "PCE", "Core Inflation", "NFP", "Unemployment", "Payrolls"]
-    tier2_events = ["JOLTs", "ADP", "PMI","Auction", "Retail Sales",]
-    tier3_events = [
-        "Consumer Confidence",
-        "Weekly Jobless Claims",
-        "Industrial Production",
-        "Challenger Job Cuts",
-        "Consumer Inflation"
-    ]
-    my_macro_events = tier1_events + tier2_events + tier3_events
-
-    # Tier dictionary
-    my_tier_dic = {}
-    for event in my_macro_events:
-        tier = 4
-        if event in tier1_events:
-            tier = 1
-        elif event in tier2_events:
-            tier = 2
-        elif event in tier3_events:
-            tier = 3
-        my_tier_dic[event] = tier
-
-    # Flag dictionary
-    my_flag_dic = {
-        "IND_MACRO": my_macro_events,
-        "IND_Tier1": tier1_events,
-        "IND_Tier2": tier2_events,
-        "IND_Tier3": tier3_events,
-        "IND_FED": ["FOMC", "Speech", "Beige", "Speak"],
-    }
+    my_tier_dic = dict(TIER_DIC if tier_dic is None else tier_dic)
+    my_flag_dic = FLAG_DIC if flag_dic is None else flag_dic
 
     events_excel_path = os.path.join(events_data_folder, events_data_path)
    
     # Create Events class instance
-    add_new_events_dic={'IST':['US']}
     myevents = Events(events_excel_path, my_tier_dic, my_flag_dic,new_events_folder=folder_events,
-                      add_new_events_dic=add_new_events_dic,
-                      change_tiers=change_tiers_bool)
+                      add_new_events_dic=ADD_NEW_EVENTS_DIC,
+                      change_tiers=change_tiers_bool,
+                      sheet_cache_folder=EVENT_SHEET_CACHE)
 
     # Save combined events
     combined_excel = myevents.combined_excel
@@ -101,6 +114,9 @@ def _change_event_tiers(
     )
     myevents.save_sheet(combined_excel_target_tz, combined_excel_target_tz_path)
 
+    # Typed event store read by the dashboards (models/event_store.py), next to the csv
+    write_event_store(pd.read_csv(combined_excel_target_tz_path), _event_store_path(combined_excel_target_tz_path))
+
     # Return the path to the final processed file
     return (combined_excel_target_tz, combined_excel_target_tz_path)
 
@@ -111,42 +127,158 @@ def scan_folder_and_calculate_returns(
         processed_folder,
         final_events_data,
         # output_folder,  # COMMENTED OUT: stats_and_plots_folder no longer needed
+        incremental=False,
         ):
    
     for tickersymbol,tickerinterval,ticker_bps_factor in ticker_match_tuple:
-        file_path = 'NA'
-        for csvfile in os.scandir(input_folder):
-            if 'stats' in csvfile.name:
-                continue
-            if csvfile.is_file() and csvfile.name.endswith('.parquet') and (csvfile.name.split('_'))[2]==tickersymbol and (csvfile.name.split('_'))[3]==tickerinterval:
-                file_path = csvfile.path
-        if file_path=='NA':
+        entry = find_dataset(input_folder, tickersymbol, tickerinterval, 'raw')
+        if entry is None:
             continue
-        csvdata=pd.read_parquet(file_path , engine = 'pyarrow')
-        print(csvdata.columns)
-
-        if 'd' in tickerinterval: #Add time to DATE and make it "DATE + 23:59:00" if interval >=1d
-            csvdata=ManipulateTimezone.add_time_for_d_intervals(csvdata,csvdata.columns[0])
-
-
-        csvdata.dropna(inplace=True,axis=0,how='all')
-        csvdata['timestamp']=csvdata.index
-        csvdata.reset_index(drop=True,inplace=True) #df does not have a Datetime column anymore & index is 0,1,2,3...
-        print(csvdata.tail())
-
-        (final_data, final_data_path) = _get_distribution_of_returns(
-            ticker_bps_factor,
-            combined_excel_target_tz=final_events_data,
-            processed_data_folder=processed_folder,
-            pre_fed_data=[csvdata, tickersymbol],
-            skip_data_fetching=True,
-            # myoutput_folder=output_folder,  # COMMENTED OUT: stats_and_plots_folder no longer needed
-            interval=tickerinterval,
-            month_day_filter=[],#[12, 15, 31] 12: December, 15: Start Date, 31: End Date
-            
-        )
-        print(f"Processed files saved at: {final_data_path}")
-        #print(final_data)
+        _calculate_returns_for_file(entry.path, tickersymbol, tickerinterval, ticker_bps_factor,
+                                    processed_folder, final_events_data, incremental)
+
+
+def _calculate_returns_for_file(
+        input_path,
+        tickersymbol,
+        tickerinterval,
+        ticker_bps_factor,
+        processed_folder,
+        final_events_data,
+        incremental=False,
+        ):
+    """Tags and filters one raw intraday parquet. Returns the path of the nonevents file."""
+    # The OHLC store holds the bars appended since the monolithic file was last exported
+    csvdata=load_raw_prices(parse_file_name(os.path.dirname(input_path), os.path.basename(input_path)))
+    print(csvdata.columns)
+
+    if 'd' in tickerinterval: #Add time to DATE and make it "DATE + 23:59:00" if interval >=1d
+        csvdata=ManipulateTimezone.add_time_for_d_intervals(csvdata,csvdata.columns[0])
+
+
+    csvdata.dropna(inplace=True,axis=0,how='all')
+    csvdata['timestamp']=csvdata.index
+    csvdata.reset_index(drop=True,inplace=True) #df does not have a Datetime column anymore & index is 0,1,2,3...
+    print(csvdata.tail())
+
+    (final_data, final_data_path) = _get_distribution_of_returns(
+        ticker_bps_factor,
+        combined_excel_target_tz=final_events_data,
+        processed_data_folder=processed_folder,
+        pre_fed_data=[csvdata, tickersymbol],
+        skip_data_fetching=True,
+        # myoutput_folder=output_folder,  # COMMENTED OUT: stats_and_plots_folder no longer needed
+        interval=tickerinterval,
+        month_day_filter=[],#[12, 15, 31] 12: December, 15: Start Date, 31: End Date
+        incremental=incremental,
+    )
+    print(f"Processed files saved at: {final_data_path}")
+    #print(final_data)
+    return final_data_path
+
+
+# Widest reach of an event in Nonevents.filter_nonevents: a Tier 1 event flags its whole day
+EVENT_LOOKBACK = pd.Timedelta(days=1)
+# Row order of the processed files: by bar, events sharing a bar by name, undated rows last.
+# The other columns break the remaining ties (an event listed twice for one bar with different values).
+PROCESSED_SORT_KEY = ["timestamp", "events"]
+
+
+def _sort_processed(df):
+    """df in PROCESSED_SORT_KEY order, so a full rebuild and an incremental run write the same rows in the same order."""
+    by = PROCESSED_SORT_KEY + [col for col in df.columns if col not in PROCESSED_SORT_KEY]
+    # Compared as values: a categorical column would otherwise sort in the order of its categories
+    return df.sort_values(by, kind="mergesort", na_position="last", ignore_index=True,
+                          key=lambda col: col.astype(object) if isinstance(col.dtype, pd.CategoricalDtype) else col)
+
+
+def _tag_and_filter(returns_obj, events_df, price_df, month_day_filter):
+    """Tags price_df with events_df, adds the sessions and filters the non-event bars.
+    Returns (filtered_data, ne_filtered_data)."""
+    tagged_data = returns_obj.tag_events(events_df, price_df)
+    filtered_data = returns_obj.filter_date(
+        filter_df=tagged_data, month_day_filter=month_day_filter, to_sessions=True
+    )
+
+    if "Datetime" in (filtered_data.columns):
+        filtered_data.drop(axis=1, columns=["Datetime"], inplace=True)
+
+    # Filtering Nonevents (filter_nonevents adds IND_NE_remove in place, so give it a copy)
+    nonevents_obj = Nonevents(filtered_data.copy())
+    nonevents_data = nonevents_obj.filter_nonevents(nonevents_obj.dataframe)
+    ne_filtered_data = nonevents_data[
+        ((nonevents_data["IND_NE_remove"] == 0) & (~nonevents_data["Volume"].isnull()))
+    ]
+    return (_sort_processed(filtered_data), _sort_processed(ne_filtered_data))
+
+
+def _watermark_path(parquet_path):
+    return parquet_path.rsplit(".", 1)[0] + ".watermark.json"
+
+
+def _write_watermark(parquet_path, watermark, inputs_hash):
+    with open(_watermark_path(parquet_path), "w") as f:
+        json.dump({"watermark": str(watermark), "inputs_hash": inputs_hash}, f)
+
+
+def _read_watermark(parquet_path):
+    try:
+        with open(_watermark_path(parquet_path)) as f:
+            state = json.load(f)
+        return pd.Timestamp(state["watermark"]), state["inputs_hash"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+def _cutoff(watermark):
+    # Start of the day, so the Tier 1 day flags of every re-tagged date are complete
+    return (watermark - EVENT_LOOKBACK).normalize()
+
+
+def _hash_end(watermark):
+    # Rows before the cutoff depend on the inputs up to one lookback after it
+    return _cutoff(watermark) + EVENT_LOOKBACK
+
+
+def _inputs_hash(price_df, price_ts, events_df, event_ts, end):
+    """SHA-1 of the price bars and events stamped before end (naive US/Eastern) and of the tagging code version."""
+    digest = hashlib.sha1(_returns_version().encode("utf-8"))
+    for df in (price_df[price_ts < end], events_df[event_ts < end]):
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _incremental_cutoff(filtered_path, ne_path, price_df, price_ts, events_df, event_ts):
+    """
+    Timestamp from which the processed files at filtered_path / ne_path have to be re-tagged,
+    or None if they need a full rebuild.
+
+    The watermark file written next to the processed file records the last tagged bar and a hash of the
+    inputs the rows before the cutoff depend on. If older bars or events changed since (e.g. a revised
+    calendar), the stored rows can't be reused.
+    """
+    state = _read_watermark(filtered_path)
+    if state is None or not (os.path.exists(filtered_path) and os.path.exists(ne_path)):
+        return None
+    watermark, inputs_hash = state
+    if _inputs_hash(price_df, price_ts, events_df, event_ts, _hash_end(watermark)) != inputs_hash:
+        print(f"{os.path.basename(filtered_path)}: inputs before {watermark} or the tagging code changed, rebuilding")
+        return None
+    return _cutoff(watermark)
+
+
+def _replace_tail(stored, tail, cutoff):
+    """
+    stored rows before cutoff and the re-tagged rows from cutoff on (and the undated events), in the
+    row order of a full rebuild (_sort_processed).
+
+    The stored file was written in that order and every row kept from it is before the cutoff, so only
+    the tail is sorted. (Files written before the order was fixed fail the watermark check, which includes
+    the tagging code version, and are rebuilt in full once.)
+    """
+    tail = tail[(tail["timestamp"] >= cutoff) | tail["timestamp"].isna()]
+    return pd.concat([stored[stored["timestamp"] < cutoff], _sort_processed(tail)], ignore_index=True)
+
 
 def _get_distribution_of_returns(
     bps_factor,
@@ -159,7 +291,8 @@ def _get_distribution_of_returns(
     # myoutput_folder="NotDefined",  # COMMENTED OUT: stats_and_plots_folder no longer needed
     skip_data_fetching=False,
     pre_fed_data="",
-    month_day_filter=[]#Don't filter dates by default
+    month_day_filter=[],#Don't filter dates by default
+    incremental=False
 ):
     """
     Processes intraday data for a given list of tickers, performs tagging, filtering, and generates output files.
@@ -171,6 +304,8 @@ def _get_distribution_of_returns(
         end_intraday (int): End date offset in days for fetching intraday data.
         combined_excel_target_tz (str): Path to the events Excel file with target timezone data.
         processed_data_folder (str): Folder path to save processed files.
+        incremental (bool): Re-tag only the bars after the watermark of the existing processed files
+            (see _incremental_cutoff) instead of the full history.
 
     Returns:
         dict: Paths of the processed files.
@@ -207,44 +342,58 @@ def _get_distribution_of_returns(
         checkdf=data, tz_col="timestamp", default_tz=current_tz, target_tz="US/Eastern"
     )
 
-    # Event Tagging
-    returns_obj = Returns(dataframe=data_target_tz)  # COMMENTED OUT: ,output_folder=myoutput_folder
-    tagged_data = returns_obj.tag_events(
-        (combined_excel_target_tz), returns_obj.dataframe.copy()
-    )
-
-    # Filtering Data
     if month_day_filter==[]:
         filtered_dates=""
     else:
         filtered_dates="_filtered_dates"
-    filtered_data = returns_obj.filter_date(
-        filter_df=tagged_data, month_day_filter=month_day_filter, to_sessions=True
-    )
-
-    if "Datetime" in (filtered_data.columns):
-        filtered_data.drop(axis=1, columns=["Datetime"], inplace=True)
-
-    # saving the parquet for event data.
     filtered_data_path_pq = os.path.join(
         processed_data_folder,
         f"{ticker_symbol}_{interval}{filtered_dates}_events_tagged_target_tz.parquet",
     )
-    filtered_data.to_parquet(filtered_data_path_pq , engine = 'pyarrow' ,  index = False)
-
-    # Filtering Nonevents
-    nonevents_obj = Nonevents(filtered_data)
-    nonevents_data = nonevents_obj.filter_nonevents(nonevents_obj.dataframe)
-    ne_filtered_data = nonevents_data[
-        ((nonevents_data["IND_NE_remove"] == 0) & (~nonevents_data["Volume"].isnull()))
-    ]
-
-    #saving the parquet for NE data.
     ne_filtered_data_path_pq = os.path.join(
         processed_data_folder,
         f"{ticker_symbol}_{interval}{filtered_dates}_events_tagged_target_tz_nonevents.parquet",
     )
-    ne_filtered_data.to_parquet(ne_filtered_data_path_pq , engine = 'pyarrow' , index = False)
+
+    returns_obj = Returns(dataframe=data_target_tz)  # COMMENTED OUT: ,output_folder=myoutput_folder
+    price_ts = data_target_tz["timestamp"].dt.tz_localize(None)
+    event_ts = combined_excel_target_tz["datetime"].dt.tz_localize(None)
+
+    cutoff = None
+    if incremental:
+        cutoff = _incremental_cutoff(filtered_data_path_pq, ne_filtered_data_path_pq,
+                                     data_target_tz, price_ts, combined_excel_target_tz, event_ts)
+
+    if cutoff is None:
+        (filtered_data, ne_filtered_data) = _tag_and_filter(
+            returns_obj, combined_excel_target_tz, returns_obj.dataframe.copy(), month_day_filter
+        )
+    else:
+        # Re-tag only the bars from the cutoff on, with one more lookback of context for the event windows
+        context_start = cutoff - EVENT_LOOKBACK
+        (filtered_tail, ne_tail) = _tag_and_filter(
+            returns_obj,
+            combined_excel_target_tz[(event_ts >= context_start) | event_ts.isna()],
+            data_target_tz[price_ts >= context_start].copy(),
+            month_day_filter,
+        )
+        filtered_data = _replace_tail(pd.read_parquet(filtered_data_path_pq), filtered_tail, cutoff)
+        ne_filtered_data = _replace_tail(pd.read_parquet(ne_filtered_data_path_pq), ne_tail, cutoff)
+        print(f"{os.path.basename(filtered_data_path_pq)}: re-tagged rows from {cutoff}")
+
+    # saving the parquet for event data.
+    write_processed_parquet(filtered_data, filtered_data_path_pq)
+
+    #saving the parquet for NE data.
+    ne_filtered_data = write_processed_parquet(ne_filtered_data, ne_filtered_data_path_pq)
+
+    if price_ts.notna().any():
+        watermark = price_ts.max()
+        _write_watermark(
+            filtered_data_path_pq,
+            watermark,
+            _inputs_hash(data_target_tz, price_ts, combined_excel_target_tz, event_ts, _hash_end(watermark)),
+        )
 
     # COMMENTED OUT: stats_and_plots_folder no longer needed
     # _get_stats_plots(
@@ -281,10 +430,140 @@ def _get_distribution_of_returns(
 #     my_returns_object.plot_daily_session_volatility_returns(ne_filtered_data, tickersymbol, interval,bps_factor)
 
     
+def _new_events_files(events_data_folder):
+    """The calendar csv files Events.append_new_events reads from events_data_folder."""
+    return sorted(
+        os.path.join(events_data_folder, file.name)
+        for file in os.scandir(events_data_folder)
+        if file.is_file() and file.name.endswith('.csv')
+        and any(tz_key in file.name and any(event in file.name for event in events)
+                for tz_key, events in ADD_NEW_EVENTS_DIC.items())
+    )
+
+
+def _remove_stale_calendars(processed_data_folder):
+    """Drops the combined calendars of earlier date ranges (only the latest of each kind is read)."""
+    for entry in CATALOG.entries(processed_data_folder):
+        if entry.kind in ("combined", "combined_target_tz"):
+            latest = find_dataset(processed_data_folder, None, None, entry.kind, entry.file_type)
+            if entry.path != latest.path:
+                os.remove(entry.path)
+
+
+def _event_store_path(events_csv_path):
+    """The event store written next to a combined_target_tz csv (same name, .parquet)."""
+    return os.path.splitext(events_csv_path)[0] + '.parquet'
+
+
+def _load_events_target_tz(events_csv_path):
+    """Reads back the combined_target_tz calendar written by _change_event_tiers."""
+    events = pd.read_csv(events_csv_path)
+    events['datetime'] = pd.to_datetime(events['datetime'], utc=True, format='ISO8601').dt.tz_convert('US/Eastern')
+    return events
+
+
+def _events_stage(events_data_folder, processed_data_folder, events_data_path, tier_dic, flag_dic):
+    (_, final_path) = _change_event_tiers(
+        events_data_folder=events_data_folder,
+        processed_data_folder=processed_data_folder,
+        events_data_path=events_data_path,
+        change_tiers_bool=True,
+        tier_dic=tier_dic,
+        flag_dic=flag_dic,
+    )
+    print(f"Processed Events file saved at: {final_path}")
+    _remove_stale_calendars(processed_data_folder)
+    return [find_dataset(processed_data_folder, None, None, "combined", ".csv").path, final_path,
+            _event_store_path(final_path)]
+
+
+def _returns_stage(input_path, tickersymbol, tickerinterval, ticker_bps_factor, processed_folder,
+                   events_csv_path, incremental=False):
+    _calculate_returns_for_file(input_path, tickersymbol, tickerinterval, ticker_bps_factor, processed_folder,
+                                _load_events_target_tz(events_csv_path), incremental)
+    filtered_path = os.path.join(processed_folder, f"{tickersymbol}_{tickerinterval}_events_tagged_target_tz.parquet")
+    return [_watermark_path(filtered_path)]
+
+
+def _code_version(*objects):
+    """SHA-1 of PIPELINE_VERSION, EVENT_LOOKBACK and the source code of objects (functions, classes, modules)."""
+    digest = hashlib.sha1(f"{PIPELINE_VERSION}|{EVENT_LOOKBACK}".encode("utf-8"))
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _events_version():
+    # Code behind the processed calendar and the event store
+    return _code_version(_change_event_tiers, _events_stage, Events, ManipulateTimezone, build_event_store)
+
+
+def _returns_version():
+    # Code behind the event-tagged files: a change re-runs the ticker stages and invalidates their watermarks
+    return _code_version(_returns_stage, _calculate_returns_for_file, _get_distribution_of_returns, _tag_and_filter,
+                         _sort_processed, _replace_tail, Returns, Nonevents, ManipulateTimezone,
+                         write_processed_parquet)
+
+
+def _events_csv(dep_outputs):
+    return [path for path in dep_outputs["events"] if path.endswith("_combined_target_tz.csv")][0]
+
+
+def returns_pipeline(ticker_match_tuple, events_data_folder, events_data_path, input_folder, processed_folder,
+                     incremental=False):
+    """
+    Stages of the returns pipeline: the events calendar, then one independent stage per raw intraday file.
+
+    A ticker stage depends on its raw parquet and the processed calendar only, so when one ticker's data
+    updates the other tickers' outputs are not rebuilt. Every stage is also re-run when its code version
+    changes (_events_version / _returns_version: PIPELINE_VERSION, EVENT_LOOKBACK and the source of the
+    code it runs); the tier and flag dictionaries are part of the events stage's kwargs.
+
+    Returns:
+        list: Stage objects for utils.pipeline.PipelineRunner.
+    """
+    stages = [Stage(
+        "events",
+        _events_stage,
+        inputs=[os.path.join(events_data_folder, events_data_path)] + _new_events_files(events_data_folder),
+        kwargs={"events_data_folder": events_data_folder, "processed_data_folder": processed_folder,
+                "events_data_path": events_data_path, "tier_dic": TIER_DIC, "flag_dic": FLAG_DIC},
+        version=_events_version(),
+    )]
+    returns_version = _returns_version()
+    for tickersymbol,tickerinterval,ticker_bps_factor in ticker_match_tuple:
+        entry = find_dataset(input_folder, tickersymbol, tickerinterval, 'raw')
+        if entry is None:
+            continue
+        stem = os.path.join(processed_folder, f"{tickersymbol}_{tickerinterval}_events_tagged_target_tz")
+        # Bars are read from the OHLC store when it is current, so its files are the stage's price inputs
+        price_inputs = (store_files(OHLC_STORE_ROOT, tickersymbol, tickerinterval) if store_is_current(entry)
+                        else [entry.path])
+        stages.append(Stage(
+            f"returns_{tickersymbol}_{tickerinterval}",
+            _returns_stage,
+            inputs=lambda dep_outputs, paths=price_inputs: paths + [_events_csv(dep_outputs)],
+            outputs=[f"{stem}.parquet", f"{stem}_nonevents.parquet"],
+            deps=["events"],
+            kwargs=lambda dep_outputs, args=(entry.path, tickersymbol, tickerinterval, ticker_bps_factor): dict(
+                zip(("input_path", "tickersymbol", "tickerinterval", "ticker_bps_factor"), args),
+                processed_folder=processed_folder,
+                events_csv_path=_events_csv(dep_outputs),
+                incremental=incremental,
+            ),
+            version=returns_version,
+        ))
+    return stages
+
+
 folder_events= 'Input_data'
 folder_input = Intraday_data_files + '_pq'
 # folder_output = Intraday_data_files+'_stats_and_plots_folder'  # COMMENTED OUT: no longer needed
 folder_processed_pq = Intraday_data_files+'_processed_folder_pq'
+folder_matrix_cache = os.path.join('.result_cache', 'probability_matrix') # cached GetMatrix results, invalid once folder_processed_pq is rebuilt
+INCREMENTAL_TAGGING = True # re-tag only the bars after each processed file's watermark instead of rebuilding the folder
+PIPELINE_STATE_FILE = 'pipeline_state.json' # input hashes of the last run of each stage, kept in folder_processed_pq
+PIPELINE_WORKERS = 4 # ticker stages run in parallel worker processes
 ticker_match_tuple=(("ZN",'1m',16),
                         ("ZN",'15m',16),
                         ("ZN",'1h',16),
@@ -314,17 +593,21 @@ if __name__ == "__main__":
     # except PermissionError:
     #     print(f"Permission denied to delete '{folder_output}'.")
 
-    try:
-        shutil.rmtree(folder_processed_pq)
-        print(f"Directory '{folder_processed_pq}' and its contents have been deleted successfully.")
-    except FileNotFoundError:
-        print(f"Directory '{folder_processed_pq}' does not exist.")
-    except PermissionError:
-        print(f"Permission denied to delete '{folder_processed_pq}'.")
+    if not INCREMENTAL_TAGGING:
+        try:
+            shutil.rmtree(folder_processed_pq)
+            print(f"Directory '{folder_processed_pq}' and its contents have been deleted successfully.")
+        except FileNotFoundError:
+            print(f"Directory '{folder_processed_pq}' does not exist.")
+        except PermissionError:
+            print(f"Permission denied to delete '{folder_processed_pq}'.")
+
+        # Cached probability matrices were built from the deleted files
+        ResultCache(folder_matrix_cache).clear()
 
     # os.makedirs(folder_processed)#exist_ok=True)
     # os.makedirs(folder_output)  # COMMENTED OUT: stats_and_plots_folder no longer needed
-    os.makedirs(folder_processed_pq)
+    os.makedirs(folder_processed_pq, exist_ok=True)
    
     myevents_path = "EconomicEventsSheet15-24.xlsx"
     ticker_match_tuple=(("ZN",'1m',16),
@@ -337,19 +620,25 @@ if __name__ == "__main__":
                         ('FGBL','1d',100)
                         )
 
-    # Create Events DataFrame
-    (final_events_data, final_path) = _change_event_tiers(
-        events_data_folder=folder_events,
-        processed_data_folder=folder_processed_pq,
-        events_data_path=myevents_path,
-        change_tiers_bool=True
-    )
-    print(f"Processed Events file saved at: {final_path}")
-
-    scan_folder_and_calculate_returns(
+    # Events calendar, then one stage per ticker; stages whose inputs didn't change are skipped
+    stages = returns_pipeline(
         ticker_match_tuple,
+        folder_events,
+        myevents_path,
         folder_input,
         folder_processed_pq,
-        final_events_data,
-        # folder_output,  # COMMENTED OUT: stats_and_plots_folder no longer needed
-    )
\ No newline at end of file
+        incremental=INCREMENTAL_TAGGING,
+    )
+    try:
+        status = PipelineRunner(os.path.join(folder_processed_pq, PIPELINE_STATE_FILE)).run(
+            stages, max_workers=PIPELINE_WORKERS
+        )
+    except RuntimeError:
+        # Stages that finished before the failure may have rewritten their files
+        ResultCache(folder_matrix_cache).clear()
+        raise
+    print(status)
+
+    # Cached probability matrices were built from the processed files the ticker stages rewrote
+    if any(state == "ran" for name, state in status.items() if name.startswith("returns_")):
+        ResultCache(folder_matrix_cache).clear()
\ No newline at end of file
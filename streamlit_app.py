@@ -22,7 +22,8 @@ from models.constants import (
     SUB_EVENT_DICT as sub_event_dict,
     PERCENTAGE_EVENTS as percentage_events,
 )
-from models.data_loader import get_data, get_price_movt
+from models.data_loader import get_price_movt
+from models.event_store import load_event_store
 from models.event_processor import (
     add_start_end_ts,
     filter_event_df,
@@ -802,13 +803,7 @@ elif tab == "Pull back analysis":
             ohcl['timestamp'] = pd.to_datetime(ohcl['timestamp'])
             ohcl['timestamp'] = ohcl['timestamp'].dt.tz_localize('US/Eastern')
 
-            event_data = get_data("Intraday_data_files_processed_folder_pq", ['EconomicEventsSheet', 'target'], ".csv")
-            event_data["events"] = event_data["events"].astype(str)
-            event_data = event_data.dropna(subset=["events"])
-            event_data = event_data.drop_duplicates(subset=["datetime", "events"], keep="last")
-            event_data["cleaned_events"] = event_data["events"].str.strip().str.lower().str.replace(" ", "")
-            event_data['datetime'] = pd.to_datetime(event_data['datetime'] , utc = True , errors='coerce')
-            event_data['datetime'] = event_data['datetime'].dt.tz_convert('US/Eastern')
+            event_data = load_event_store()
 
             df_list = detect_moves(event_data , trend_establish_threshold , trend_reverse_threshold , event_selected , ohcl)
             df_list = [
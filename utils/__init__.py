@@ -7,7 +7,17 @@ from .helpers import (
     timeit,
     clean_text,
     convert_shorthand,
+    parse_shorthand,
     sanitize_sheet_name,
+    file_sha1,
 )
 
+from .result_cache import (
+    ResultCache,
+    file_fingerprint,
+)
 
+from .pipeline import (
+    PipelineRunner,
+    Stage,
+)
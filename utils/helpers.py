@@ -5,8 +5,10 @@ Functions moved here from core/utils.py.
 
 import time
 import re
+import hashlib
 import unicodedata
 from functools import wraps
+import numpy as np
 import pandas as pd
 
 def timeit(func):
@@ -19,6 +21,14 @@ def timeit(func):
         return result
     return wrapper
 
+def file_sha1(path, chunk_size=1 << 20):
+    """SHA-1 hex digest of a file's content, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 # 5.1.1used to remove non-breaking spaces, zero width spaces, leading & lagging spaces from the event data file.
 def clean_text(s):
     if pd.isna(s):
@@ -67,6 +77,62 @@ def convert_shorthand(x):
     except ValueError:
         return pd.to_numeric(x, errors='coerce')
 
+SHORTHAND_MULTIPLIERS = {'T': 1_000_000_000_000, 'M': 1_000_000, 'B': 1_000_000_000, 'K': 1_000, '%': 0.01}
+_NUMBER_TYPES = [int, float, np.int64, np.int32, np.float64, np.float32]
+
+def _float_or_nan(text):
+    try:
+        return float(text)
+    except ValueError:
+        return float('nan')
+
+def _parse_shorthand_text(text):
+    text = text.str.strip().str.upper()
+    text = text.str.replace(',', '', regex=False).str.replace('$', '', regex=False)
+    text = text.str.replace(r'^-+', '-', regex=True)
+    parts = text.str.extract(r'^(?P<number>.*?)(?P<suffix>[TMBK%]?)$')
+    number = parts['number']
+    multiplier = parts['suffix'].map(SHORTHAND_MULTIPLIERS).fillna(1).to_numpy(dtype='float64')
+
+    # to_numeric finds the numbers, but can be off in the last bit: parse them again with float() via astype
+    parseable = pd.to_numeric(number, errors='coerce').notna().to_numpy()
+    result = np.full(len(text), np.nan)
+    try:
+        result[parseable] = number[parseable].astype('float64').to_numpy()
+    except ValueError:
+        result[parseable] = [_float_or_nan(t) for t in number[parseable]]
+    # Spellings only float() accepts ('1_000', '1E500')
+    rest = ~parseable & (number != '').to_numpy()
+    result[rest] = [_float_or_nan(t) for t in number[rest]]
+    return result * multiplier
+
+def parse_shorthand(values):
+    """
+    Vectorized convert_shorthand for a whole column: '$1.2B' -> 1.2e9, '0.3%' -> 0.003, '1,234K' -> 1234000.0.
+
+    Strips $ and commas, collapses repeated leading dashes and applies the K/M/B/T/% multiplier,
+    giving the same values as convert_shorthand row by row. Unparseable values become NaN.
+
+    Returns:
+        pd.Series: float64, with the index of values when it is a Series.
+    """
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype('float64')
+
+    result = np.full(len(values), np.nan)
+    # Cells that already hold numbers (most of an Excel column) need no parsing
+    is_number = values.map(type).isin(_NUMBER_TYPES).to_numpy()
+    if is_number.any():
+        result[is_number] = pd.to_numeric(values[is_number]).to_numpy(dtype='float64')
+
+    is_text = ~is_number & values.notna().to_numpy()
+    if is_text.any():
+        # Calendar values repeat a lot ('Actual', '164K', ...): parse each distinct string once
+        codes, uniques = pd.factorize(values[is_text].astype(str))
+        result[is_text] = _parse_shorthand_text(pd.Series(uniques, dtype=object))[codes]
+    return pd.Series(result, index=values.index, name=values.name)
+
 def sanitize_sheet_name(name: str) -> str:
     """Sanitize Excel sheet names by replacing invalid characters and truncating to 31 chars."""
     invalid_chars = ['\\', '/', '*', '?', ':', '[', ']']
@@ -0,0 +1,207 @@
+"""
+Content-hash DAG runner for DistroDashboard pipelines.
+Each stage declares its input files, output files and the stages it depends on. A stage is skipped
+when the SHA-1 of its inputs, parameters and code version matches its last successful run and its
+outputs are still in place; independent stages run in parallel worker processes.
+"""
+
+import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from utils.helpers import file_sha1
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name (str): Unique stage name.
+        func (callable): Top-level function (it must be picklable to run in a worker process).
+            It may return a list of extra output paths, e.g. files whose names are only known once written.
+        inputs (list | callable): Input file paths, or a function of {dependency name: its output paths}
+            returning them (for inputs produced by a dependency).
+        outputs (list): Output file paths.
+        deps (list): Names of the stages that must finish first.
+        kwargs (dict | callable): Arguments of func, or a function of the dependency outputs returning them.
+        version (str): Version of the code and settings behind func (e.g. a hash of its source); a new
+            version re-runs the stage even when its inputs are unchanged.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), deps=(), kwargs=None, version=""):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.version = version
+
+    def resolve(self, dep_outputs):
+        """(input paths, kwargs) once the dependencies have run."""
+        inputs = self.inputs(dep_outputs) if callable(self.inputs) else list(self.inputs)
+        kwargs = self.kwargs(dep_outputs) if callable(self.kwargs) else dict(self.kwargs)
+        return inputs, kwargs
+
+
+def _call_stage(func, kwargs):
+    return func(**kwargs)
+
+
+class PipelineRunner:
+    """
+    Runs stages in dependency order, skipping the ones whose inputs are unchanged.
+
+    The state file records, per stage, the hash of its last successful run and its outputs. File hashes
+    are memoised on (mtime, size), so unchanged files aren't re-read on every run; a fresh checkout
+    (new mtimes, same content) is re-hashed once and still skips the stages.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        state.setdefault("stages", {})
+        state.setdefault("files", {})
+        return state
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def hash_file(self, path):
+        """Content hash of path (memoised on mtime and size)."""
+        stat = os.stat(path)
+        key = os.path.normpath(path)
+        memo = self.state["files"].get(key)
+        if memo is not None and memo[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return memo[2]
+        sha = file_sha1(path)
+        self.state["files"][key] = [stat.st_mtime_ns, stat.st_size, sha]
+        return sha
+
+    def stage_key(self, stage, inputs, kwargs):
+        payload = {
+            "name": stage.name,
+            "func": stage.func.__qualname__,
+            "version": stage.version,
+            "inputs": {os.path.normpath(path): self.hash_file(path) for path in inputs},
+            "kwargs": repr(sorted(kwargs.items())),
+        }
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _up_to_date(self, stage, key):
+        record = self.state["stages"].get(stage.name)
+        if record is None or record["key"] != key:
+            return False
+        # Outputs deleted or edited since: run again
+        for path, sha in record["outputs"].items():
+            if not os.path.exists(path) or self.hash_file(path) != sha:
+                return False
+        return True
+
+    def _record(self, stage, key, returned):
+        outputs = list(dict.fromkeys(stage.outputs + list(returned or [])))
+        self.state["stages"][stage.name] = {
+            "key": key,
+            "outputs": {path: self.hash_file(path) for path in outputs if os.path.exists(path)},
+        }
+        self._save_state()
+        return outputs
+
+    def run(self, stages, max_workers=None):
+        """
+        Run the stages. Stages whose dependencies failed are not run.
+
+        Args:
+            stages (list): Stage objects. Every dependency must be in the list.
+            max_workers (int, optional): Worker processes. 1 runs everything in this process.
+
+        Returns:
+            dict: Stage name -> "ran" or "skipped".
+
+        Raises:
+            RuntimeError: A stage raised (after every independent stage has finished).
+        """
+        by_name = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in by_name]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+
+        status = {}
+        outputs = {}
+        errors = {}
+        pending = list(stages)
+        running = {}  # future -> (stage, key)
+        executor = None
+        if max_workers != 1:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+        try:
+            while pending or running:
+                # Start every stage whose dependencies are done
+                blocked = []
+                for stage in pending:
+                    if any(dep in errors for dep in stage.deps):
+                        errors[stage.name] = "dependency failed"
+                        continue
+                    if any(dep not in status for dep in stage.deps):
+                        blocked.append(stage)
+                        continue
+                    try:
+                        inputs, kwargs = stage.resolve({dep: outputs[dep] for dep in stage.deps})
+                        key = self.stage_key(stage, inputs, kwargs)
+                    except Exception as e:
+                        errors[stage.name] = repr(e)
+                        continue
+                    if self._up_to_date(stage, key):
+                        status[stage.name] = "skipped"
+                        outputs[stage.name] = list(self.state["stages"][stage.name]["outputs"])
+                        print(f"Stage {stage.name}: inputs unchanged, skipped")
+                    elif executor is None:
+                        try:
+                            returned = _call_stage(stage.func, kwargs)
+                        except Exception as e:
+                            errors[stage.name] = repr(e)
+                            continue
+                        outputs[stage.name] = self._record(stage, key, returned)
+                        status[stage.name] = "ran"
+                    else:
+                        running[executor.submit(_call_stage, stage.func, kwargs)] = (stage, key)
+                progress = len(blocked) < len(pending)
+                pending = blocked
+                if not running:
+                    if pending and not progress:
+                        raise ValueError(f"Dependency cycle between stages {[stage.name for stage in pending]}")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    try:
+                        returned = future.result()
+                    except Exception as e:
+                        errors[stage.name] = repr(e)
+                        continue
+                    outputs[stage.name] = self._record(stage, key, returned)
+                    status[stage.name] = "ran"
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self._save_state()
+
+        if errors:
+            raise RuntimeError(f"Pipeline stages failed: {errors}")
+        return status
@@ -0,0 +1,94 @@
+"""
+Persistent result cache for DistroDashboard.
+Stores computed results (matrices, percentile dicts, figures) as pickle files on disk,
+with LRU eviction by total bytes.
+"""
+
+import os
+import pickle
+import hashlib
+
+
+def file_fingerprint(path):
+    """(absolute path, mtime_ns, size) of a data file. Changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+class ResultCache:
+    """
+    Disk cache of pickled results keyed on any tuple of hashable parameters.
+
+    Entries are single files named by the SHA-1 of the key. A hit refreshes the file's mtime,
+    so the mtime order is the LRU order and eviction removes the oldest entries first until the
+    cache fits in max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Truncated entry, or pickled before a class/module it refers to was renamed: drop it
+            self.misses += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        os.utime(path)  # mark as most recently used
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value under key (atomic write), then evict least recently used entries over budget."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """Explicit invalidation: drop every entry (e.g. after the data folders are regenerated)."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and (entry.name.endswith(".pkl") or entry.name.endswith(".tmp")):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
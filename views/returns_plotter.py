@@ -10,6 +10,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import percentileofscore
 from datetime import datetime
+from models.session_utils import get_session, label_sessions
 
 
 class ReturnsPlotter:
@@ -38,19 +39,7 @@ class ReturnsPlotter:
         os.makedirs(self.output_folder, exist_ok=True)
 
     def get_session(self, timestamp):
-        hour = timestamp.hour
-        if 18 <= hour < 24:
-            return "Asia 18-24 ET"
-        elif 0 <= hour < 7:
-            return "London 0-7 ET"
-        elif 7 <= hour < 10:
-            return "US Open 7-10 ET"
-        elif 10 <= hour < 15:
-            return "US Mid 10-15 ET"
-        elif 15 <= hour < 17:
-            return "US Close 15-17 ET"
-        else:
-            return "Other"
+        return get_session(timestamp)
 
     def plot_daily_session_returns(self, filtered_df, tickersymbol_val, interval_val, bps_factor, 
                                     returns_calculator, month_day_filter=[]):
@@ -62,7 +51,7 @@ class ReturnsPlotter:
 
         #fetching the intraday data to make the red dot.
         intraday_data = self.dataframe.copy()
-        intraday_data['session'] = intraday_data['timestamp'].apply(self.get_session)
+        intraday_data['session'] = label_sessions(intraday_data['timestamp'])
         intraday_data['date'] = intraday_data['timestamp'].dt.date
 
         plt.figure(figsize=(24, 18))
@@ -228,7 +217,7 @@ class ReturnsPlotter:
 
         #fetching intraday data for the red dot.
         intraday_data = self.dataframe.copy()
-        intraday_data['session'] = intraday_data['timestamp'].apply(self.get_session)
+        intraday_data['session'] = label_sessions(intraday_data['timestamp'])
         intraday_data['date'] = intraday_data['timestamp'].dt.date
 
         latest_return = -1